@@ -0,0 +1,74 @@
+"""
+Benchmark: bounded-memory dedup index.
+Indexes a corpus of random invite codes with InviteIndex at several Bloom filter
+sizes, then looks up as many absent codes as present ones. Reports the measured
+and expected false-positive rate, how many lookups reached the disk index, and
+lookup throughput, next to the in-memory InviteSet for reference.
+
+Usage:
+    python benchmarks/bench_dedup_index.py [--codes 1000000] [--lookups 200000]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from invite_index import InviteIndex
+from invite_set import InviteSet
+
+FILTER_SIZES_MB = [0.5, 2, 8]
+
+
+def random_codes(count, seed):
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits
+    return [''.join(rng.choices(alphabet, k=rng.choice([7, 8, 10]))) for _ in range(count)]
+
+
+def time_lookups(index, probes):
+    start = time.perf_counter()
+    found = sum(1 for code in probes if index.has_code(code))
+    return found, len(probes) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the bounded-memory dedup index')
+    parser.add_argument('--codes', type=int, default=1000000, help='Codes in the corpus (default: 1000000)')
+    parser.add_argument('--lookups', type=int, default=200000, help='Lookups, half present and half absent (default: 200000)')
+    args = parser.parse_args()
+
+    codes = random_codes(args.codes, seed=1)
+    present = random.Random(2).sample(codes, args.lookups // 2)
+    corpus = set(codes)
+    absent = [code for code in random_codes(args.lookups, seed=3) if code not in corpus][:args.lookups // 2]
+    probes = present + absent
+    random.Random(4).shuffle(probes)
+
+    print(f"{len(corpus)} codes, {len(probes)} lookups ({len(absent)} absent)")
+    print(f"{'index':<18} {'memory MiB':>10} {'hashes':>6} {'FP %':>7} {'expected %':>10} {'disk reads':>10} {'lookups/s':>10}")
+    invites = InviteSet.from_codes(codes)
+    found, rate = time_lookups(invites, probes)
+    assert found == len(present)
+    print(f"{'InviteSet':<18} {invites.nbytes() / 1024 / 1024:>10.1f} {'-':>6} {'-':>7} {'-':>10} {'-':>10} {rate:>10.0f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in FILTER_SIZES_MB:
+            index = InviteIndex(os.path.join(tmp, f'index_{size_mb}.db'), memory_bytes=int(size_mb * 1024 * 1024))
+            index.sync(codes, 'bench')
+            found, rate = time_lookups(index, probes)
+            # Exact answers regardless of filter size
+            assert found == len(present)
+            print(f"{'InviteIndex':<18} {size_mb:>10.1f} {index.bloom.hash_count:>6} "
+                  f"{index.false_positive_rate() * 100:>7.3f} {index.bloom.expected_fp_rate(len(index)) * 100:>10.3f} "
+                  f"{index.stats['disk_lookups']:>10} {rate:>10.0f}")
+            index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Generate the HTML fixtures in benchmarks/fixtures/.
+The pages mirror the structure of real Google result pages and blog articles
+(large inline scripts and styles, nested result blocks, /url?q= redirect links,
+bolded query terms, og: meta tags); the link file mixes every invite form the
+way files merged from several sources do. Output is deterministic, so the
+checked-in files can be regenerated byte for byte.
+
+Every fixture is synthetic: no captured page is included, so benchmark
+results (and parser speedups) apply to this generated input only. Real pages
+differ in size, script weight and markup; measure on saved pages before
+drawing conclusions about them.
+
+Usage:
+    python benchmarks/make_fixtures.py
+"""
+
+import json
+import os
+import random
+import string
+from urllib.parse import quote
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SITES = ['x.com', 'medium.com', 'mirror.xyz', 'substack.com', 'hackernoon.com']
+KEYWORDS = ['crypto', 'blockchain', 'nft', 'game', 'agent', 'defi', 'web3', 'dao']
+
+LINK_FORMS = ['https://discord.gg/', 'https://discord.com/invite/', 'https://discordapp.com/invite/', 'discord.gg/']
+
+
+def _words(rng, count):
+    return ' '.join(''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(count))
+
+
+def _code(rng):
+    return ''.join(rng.choices(string.ascii_letters + string.digits, k=rng.choice([7, 8, 10])))
+
+
+def _script_blob(rng, size):
+    """A minified-looking inline script of roughly size bytes."""
+    parts = []
+    while sum(len(p) for p in parts) < size:
+        name = ''.join(rng.choices(string.ascii_letters, k=3))
+        parts.append(f'var {name}=function(a,b){{return a.{name}(b)||"{_words(rng, 3)}"}};')
+    return ''.join(parts)
+
+
+def make_serp(num_results, seed, keyword):
+    """A Google-style results page with num_results organic results."""
+    rng = random.Random(seed)
+    out = [
+        '<!doctype html><html lang="en"><head><meta charset="UTF-8">',
+        f'<title>site:x.com "discord.gg/" {keyword} - Google Search</title>',
+        f'<style>{".g{line-height:1.58}.yuRUbf{font-size:14px}" * 200}</style>',
+        f'<script nonce="x">{_script_blob(rng, 60000)}</script>',
+        '</head><body jsmodel="hspDDf"><div id="main"><div id="rcnt"><div id="search"><div id="rso">',
+    ]
+    for i in range(num_results):
+        site = rng.choice(SITES)
+        target = f'https://{site}/{_words(rng, 1)}/status/{rng.randint(10 ** 15, 10 ** 16)}'
+        if i % 9 == 0:
+            target = f'https://discord.gg/{_code(rng)}'
+        snippet = _words(rng, rng.randint(20, 40))
+        if i % 4 == 0:
+            # Google bolds the query term inside the snippet URL
+            snippet += f' join <em>discord.gg/</em>{_code(rng)} {_words(rng, 4)}'
+        elif i % 4 == 1:
+            snippet += f' discord.com/invite/{_code(rng)}'
+        out.append(
+            f'<div class="g Ww4FFb vt6azd" data-hveid="CA{i}QAA"><div class="N54PNb BToiNc">'
+            f'<div class="kb0PBd A9Y9g jGGQ5e"><div class="yuRUbf"><div><span jscontroller="msmzHf">'
+            f'<a jsname="UWckNb" href="/url?q={quote(target, safe="")}&amp;sa=U&amp;ved=2ahUKEw{i}&amp;usg=AOvVaw{i}">'
+            f'<br><h3 class="LC20lb MBeuO DKV0Md">{_words(rng, 6).title()}</h3>'
+            f'<div class="notranslate"><cite class="qLRx3b">{site}</cite></div></a></span></div></div></div>'
+            f'<div class="kb0PBd A9Y9g"><div class="VwiC3b yXK7lf p4wth r025kc hJNv6b Hdw6tb" style="-webkit-line-clamp:2">'
+            f'<span>{snippet}</span></div></div></div></div>'
+        )
+    out.append('</div></div></div></div>')
+    out.append(f'<script nonce="x">{_script_blob(rng, 40000)}</script></body></html>')
+    return ''.join(out)
+
+
+def make_article(num_paragraphs, seed, invites=True):
+    """A blog article page with a heavy app-state script, nav, and body paragraphs."""
+    rng = random.Random(seed)
+    state = {f'Post:{i}': {'title': _words(rng, 5), 'body': _words(rng, 30)} for i in range(200)}
+    out = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8">',
+        f'<title>{_words(rng, 6).title()}</title>',
+        f'<meta property="og:title" content="{_words(rng, 6)}">',
+        f'<meta name="description" content="{_words(rng, 20)}">',
+        f'<style>{"p{margin:0 0 1em}.pw-post-body-paragraph{font-size:20px}" * 150}</style>',
+        f'<script>window.__APOLLO_STATE__ = {json.dumps(state)}</script>',
+        '</head><body><div id="root"><nav class="site-nav">',
+    ]
+    for _ in range(30):
+        out.append(f'<a href="/tag/{_words(rng, 1)}">{_words(rng, 1)}</a>')
+    out.append('</nav><article><section>')
+    for i in range(num_paragraphs):
+        text = _words(rng, rng.randint(40, 90))
+        if invites and i % 25 == 10:
+            text += f' Join our community: <a href="https://discord.gg/{_code(rng)}" rel="noopener">Discord</a>.'
+        if invites and i % 40 == 20:
+            text += f' Or paste discord.com/invite/{_code(rng)} into the app.'
+        out.append(f'<p class="pw-post-body-paragraph">{text}</p>')
+    out.append('</section></article>')
+    if invites:
+        out.append(f'<meta property="og:see_also" content="https://discord.gg/{_code(rng)}">')
+    out.append(f'<footer>{_words(rng, 40)}</footer></div></body></html>')
+    return ''.join(out)
+
+
+def make_link_file(lines, seed):
+    """An unsorted link file in mixed forms; about one line in ten repeats an earlier invite."""
+    rng = random.Random(seed)
+    codes = []
+    out = []
+    for _ in range(lines):
+        if codes and rng.random() < 0.1:
+            code = rng.choice(codes)
+        else:
+            code = _code(rng)
+            codes.append(code)
+        out.append(f"{rng.choice(LINK_FORMS)}{code}\n")
+    return ''.join(out)
+
+
+FIXTURES = {
+    'serp_x_crypto.html': lambda: make_serp(100, 1, 'crypto'),
+    'serp_medium_nft.html': lambda: make_serp(50, 2, 'nft'),
+    'article_with_invites.html': lambda: make_article(300, 3),
+    'article_no_invites.html': lambda: make_article(300, 4, invites=False),
+    'serp_x_game_small.html': lambda: make_serp(10, 5, 'game'),
+    'article_short.html': lambda: make_article(40, 6),
+    'links_mixed_20k.txt': lambda: make_link_file(20000, 7),
+}
+
+
+def main():
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for name, build in FIXTURES.items():
+        path = os.path.join(FIXTURES_DIR, name)
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(build())
+        print(f"Wrote {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
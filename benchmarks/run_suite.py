@@ -0,0 +1,344 @@
+"""
+Offline benchmark suite: the scraper's hot paths at several data sizes.
+Every case runs on the checked-in corpus in benchmarks/fixtures/ (SERP and
+article pages, a mixed-form link file), scaled up where a case needs larger
+inputs, and reports operations per second, throughput and peak memory.
+The corpus is synthetic (see make_fixtures.py), so results hold for that
+input only; they are meant for comparing commits, not for predicting a run:
+    extract         invite extraction (extract_discord_links) on page text, 1x to 100x
+    extract/legacy  the original four-pattern extraction loop on the same text
+    prefilter       the raw-bytes invite prefilter, per fixture page
+    parse/BACKEND   HTML parsing with each parser backend, per fixture page
+                    (the backends are first checked to find the same invites)
+    parse-stage/N   parse_stage.ParseStage over a batch of pages with N worker
+                    processes (0: in process)
+    document        the whole fetched-document path of search_google and
+                    scrape_web_page (prefilter, parse, extract), per fixture page
+    load            loading link files of 20k, 200k and 1M lines (--large: also 3M)
+    load/legacy     the original loader (a set of raw lines) on the same files
+    lookup          membership checks against the loaded invites (/legacy: the raw set);
+                    --large adds lookups in the 3M-line set
+    save/text       a checkpoint of the text store (journal append + fsync)
+    save/sqlite     a checkpoint of the SQLite store (links with provenance)
+    compact         writing the sorted snapshot of 20k, 200k and 1M invites
+
+Results can be saved as JSON and compared with a run of another commit:
+    python benchmarks/run_suite.py --json before.json
+    git checkout other-branch
+    python benchmarks/run_suite.py --compare before.json
+
+Usage:
+    python benchmarks/run_suite.py [--quick] [--large] [--only NAME] [--json FILE] [--compare FILE]
+"""
+
+import argparse
+import gc
+import glob
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from discord_scraper import DiscordLinkScraper
+from fetch_engine import FetchResult
+from invite_extractor import prefilter_raw
+from invite_extractor import extract_invite_links
+from link_store import LinkJournal, SQLiteLinkStore
+from page_parser import DEFAULT_BACKEND, PARSER_BACKENDS, parse_page
+from parse_stage import ParseStage
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+LINK_FIXTURE = os.path.join(FIXTURES_DIR, 'links_mixed_20k.txt')
+
+LEGACY_PATTERNS = [
+    r'https?://discord\.gg/[a-zA-Z0-9-]+',
+    r'https?://discord\.com/invite/[a-zA-Z0-9-]+',
+    r'discord\.gg/[a-zA-Z0-9-]+',
+    r'discord\.com/invite/[a-zA-Z0-9-]+',
+]
+
+# Pages parsed per parse-stage call
+STAGE_BATCH = 40
+
+
+def legacy_extract(text):
+    """The original extract_discord_links: four uncompiled findall passes, normalize every match."""
+    links = set()
+    for pattern in LEGACY_PATTERNS:
+        for match in re.findall(pattern, text, re.IGNORECASE):
+            if not match.startswith('http'):
+                match = 'https://' + match
+            match = match.replace('discord.com/invite/', 'discord.gg/')
+            if 'discord.gg/' in match:
+                links.add(match)
+    return links
+
+
+def legacy_load(path):
+    """The original load_existing_links: every line kept as-is."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return set(line.strip() for line in f if line.strip())
+
+
+class Case:
+    """One benchmark: op() is timed; items (of unit) are processed per call. close() runs after it."""
+
+    def __init__(self, name, size, op, items, unit, close=None):
+        self.name = name
+        self.size = size
+        self.op = op
+        self.items = items
+        self.unit = unit
+        self.close = close
+
+    @property
+    def key(self):
+        return f"{self.name}/{self.size}"
+
+
+def measure(case, min_time, rounds):
+    """Return (best calls per second over rounds, peak bytes traced during one call)."""
+    # Warm-up call: first-call costs (imports, file creation) are not measured
+    case.op()
+    best = 0.0
+    for _ in range(rounds):
+        gc.collect()
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            case.op()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, calls / elapsed)
+    gc.collect()
+    tracemalloc.start()
+    case.op()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def read_fixture_pages():
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+        with open(path, 'rb') as f:
+            pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    return pages
+
+
+def scaled_link_file(tmp, factor):
+    """The link fixture repeated factor times, each copy with its own codes; returns (path, lines)."""
+    with open(LINK_FIXTURE, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    if factor == 1:
+        return LINK_FIXTURE, len(lines)
+    path = os.path.join(tmp, f'links_{factor}x.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        for copy in range(factor):
+            suffix = str(copy) if copy else ''
+            f.write(''.join(f"{line}{suffix}\n" for line in lines))
+    return path, len(lines) * factor
+
+
+def check_backends(pages):
+    """Warn about parser backends that find other invites than html.parser on a fixture."""
+    for name, content in pages.items():
+        html = content.decode('utf-8')
+        found = {}
+        for backend in PARSER_BACKENDS:
+            parsed = parse_page(html, backend)
+            found[backend] = extract_invite_links(parsed.text) | extract_invite_links(parsed.attribute_text())
+        for backend, links in found.items():
+            if links != found['html.parser']:
+                print(f"WARNING: {backend} found {len(links)} links in {name}, html.parser found "
+                      f"{len(found['html.parser'])}")
+
+
+def parse_batch(stage, documents):
+    codes = set()
+    for future in [stage.submit(content, 'utf-8') for content in documents]:
+        codes.update(future.result())
+    return codes
+
+
+def size_label(lines):
+    return f"{lines // 1000}k" if lines < 1000000 else f"{lines // 1000000}M"
+
+
+def build_cases(tmp, quick, large=False):
+    pages = read_fixture_pages()
+    cases = []
+    if not pages:
+        print("No fixtures found. Run: python benchmarks/make_fixtures.py")
+        return cases
+
+    # The scraper's own document path, without cache, checkpoint or query statistics
+    scraper = DiscordLinkScraper(output_file=os.path.join(tmp, 'scraper_links.txt'), cache_file=None,
+                                 schedule='fixed', checkpoint_file=None, report_file=None)
+
+    texts = [parse_page(content.decode('utf-8'), 'lxml').text for content in pages.values()]
+    base_text = ' '.join(texts)
+    for factor in ((1, 10) if quick else (1, 10, 100)):
+        text = base_text * factor
+        cases.append(Case('extract', f'{factor}x', lambda text=text: scraper.extract_discord_links(text),
+                          len(text.encode('utf-8')), 'bytes'))
+        cases.append(Case('extract/legacy', f'{factor}x', lambda text=text: legacy_extract(text),
+                          len(text.encode('utf-8')), 'bytes'))
+
+    for name, content in pages.items():
+        cases.append(Case('prefilter', name, lambda content=content: prefilter_raw(content), len(content), 'bytes'))
+    check_backends(pages)
+    for backend in PARSER_BACKENDS:
+        for name, content in pages.items():
+            html = content.decode('utf-8')
+            cases.append(Case(f'parse/{backend}', name, lambda html=html, backend=backend: parse_page(html, backend),
+                              len(content), 'bytes'))
+    documents = [content for _, content in zip(range(STAGE_BATCH), itertools.cycle(pages.values()))]
+    cores = os.cpu_count() or 1
+    worker_counts = (0, 2) if quick else sorted({n for n in (0, 1, 2, 4, cores) if n <= cores})
+    for workers in worker_counts:
+        # The pool is started by the warm-up call, as a long crawl would have it running already
+        stage = ParseStage(DEFAULT_BACKEND, workers=workers)
+        cases.append(Case(f'parse-stage/{workers}', f'{STAGE_BATCH} pages',
+                          lambda stage=stage: parse_batch(stage, documents),
+                          sum(len(content) for content in documents), 'bytes', close=stage.close))
+    for name, content in pages.items():
+        response = FetchResult(f'https://example.com/{name}', 200, content, encoding='utf-8')
+        cases.append(Case('document', name,
+                          lambda response=response: scraper._finish_extract(scraper._start_extract(response)),
+                          len(content), 'bytes'))
+
+    factors = (1, 10) if quick else (1, 10, 50)
+    if large:
+        # The multi-million-line files the compact invite set was built for
+        factors += (150,)
+    link_files = [scaled_link_file(tmp, factor) for factor in factors]
+    for path, lines in link_files:
+        cases.append(Case('load', size_label(lines), lambda path=path: LinkJournal(path).load(), lines, 'links'))
+        cases.append(Case('load/legacy', size_label(lines), lambda path=path: legacy_load(path), lines, 'links'))
+
+    links = LinkJournal(LINK_FIXTURE).load()
+    with open(LINK_FIXTURE, 'r', encoding='utf-8') as f:
+        probes = [line.strip() for line in f]
+    cases.append(Case('lookup', size_label(len(probes)), lambda: [probe in links for probe in probes],
+                      len(probes), 'lookups'))
+    if large:
+        path, lines = link_files[-1]
+        large_links = LinkJournal(path).load()
+        cases.append(Case('lookup', size_label(lines), lambda: [probe in large_links for probe in probes],
+                          len(probes), 'lookups'))
+    raw = legacy_load(LINK_FIXTURE)
+    cases.append(Case('lookup/legacy', size_label(len(probes)), lambda: [probe in raw for probe in probes],
+                      len(probes), 'lookups'))
+    urls = list(links.urls())
+    for count in ((100, 1000) if quick else (100, 1000, 10000)):
+        batch = urls[:count]
+        journal = LinkJournal(os.path.join(tmp, f'save_{count}.txt'))
+        cases.append(Case('save/text', str(count), lambda journal=journal, batch=batch: journal.save(batch),
+                          count, 'links'))
+        sightings = [(url, f'https://medium.com/p/{i % 50}', f'site:medium.com "discord.gg/" nft', 1700000000.0 + i)
+                     for i, url in enumerate(batch)]
+        store = SQLiteLinkStore(os.path.join(tmp, f'save_{count}.db'), export_file=os.path.join(tmp, f'export_{count}.txt'))
+        cases.append(Case('save/sqlite', str(count),
+                          lambda store=store, batch=batch, sightings=sightings: store.save(batch, sightings),
+                          count, 'links'))
+
+    for path, lines in link_files:
+        invites = LinkJournal(path).load()
+        journal = LinkJournal(os.path.join(tmp, f'compact_{lines}.txt'))
+        cases.append(Case('compact', size_label(lines), lambda journal=journal, invites=invites: journal.compact(invites),
+                          len(invites), 'links'))
+    return cases
+
+
+def throughput(rate, items, unit):
+    value = rate * items
+    if unit == 'bytes':
+        return f"{value / 1024 / 1024:.1f} MiB/s"
+    if value >= 1e6:
+        return f"{value / 1e6:.2f}M {unit}/s"
+    return f"{value / 1e3:.1f}k {unit}/s"
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark suite over the fixture corpus')
+    parser.add_argument('--quick', action='store_true', help='Skip the largest data size of each case')
+    parser.add_argument('--large', action='store_true',
+                        help='Add 3M-line link files to the load, lookup and compact cases (slow, ~500 MB of memory)')
+    parser.add_argument('--only', metavar='NAME', help='Run only the cases whose name starts with NAME')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Seconds per timing round (default: 0.2)')
+    parser.add_argument('--rounds', type=int, default=3, help='Timing rounds per case; the best counts (default: 3)')
+    parser.add_argument('--json', metavar='FILE', help='Save the results to FILE')
+    parser.add_argument('--compare', metavar='FILE', help='Compare with results saved by --json')
+    parser.add_argument('--threshold', type=float, default=10,
+                        help='With --compare, flag cases this many percent slower (default: 10)')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Comparing with {args.compare} (commit {baseline['meta'].get('commit')})")
+
+    meta = {'commit': git_commit(), 'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+    results = {}
+    regressions = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = build_cases(tmp, args.quick, args.large)
+        if args.only:
+            cases = [case for case in cases if case.name.startswith(args.only)]
+        header = f"{'case':<18} {'size':<28} {'ops/s':>10} {'throughput':>16} {'peak KiB':>9}"
+        if baseline:
+            header += f" {'vs base':>8}"
+        print(header)
+        for case in cases:
+            try:
+                rate, peak = measure(case, args.min_time, args.rounds)
+            finally:
+                if case.close:
+                    case.close()
+            results[case.key] = {'ops_per_second': round(rate, 3), 'items': case.items, 'unit': case.unit,
+                                 'peak_bytes': peak}
+            line = (f"{case.name:<18} {case.size:<28} {rate:>10.1f} {throughput(rate, case.items, case.unit):>16} "
+                    f"{peak / 1024:>9.0f}")
+            previous = baseline['results'].get(case.key) if baseline else None
+            if previous:
+                change = (rate / previous['ops_per_second'] - 1) * 100
+                line += f" {change:>+7.1f}%"
+                if change <= -args.threshold:
+                    line += "  SLOWER"
+                    regressions += 1
+            print(line)
+
+    if baseline:
+        print(f"{regressions} of {len(results)} cases more than {args.threshold:.0f}% slower than the baseline")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+            f.write('\n')
+        print(f"Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Crawl stage for the Discord scraper: follows search-result URLs into the pages.
+Result URLs (decoded Google /url?q= links, Custom Search API link fields) are
+normalized and queued in a deduplicated priority frontier: shallow pages and
+top-ranked results first, a depth limit, and a cap on how many pages of one
+domain are handed out per fetch round. robots.txt is fetched once per site
+through the fetch engine (and its HTTP cache) and honored before any page
+is requested.
+"""
+
+import heapq
+import html
+import re
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
+from page_parser import decode_google_href
+
+# Anchor targets read straight from the raw bytes, so pages the invite
+# prefilter never parses still yield their links
+HREF_PATTERN = re.compile(rb'<a\s[^>]*?href\s*=\s*["\']([^"\'<>\s]+)', re.IGNORECASE)
+
+# Query parameters that only track the click and do not change the page (plus utm_*)
+TRACKING_PARAMS = frozenset(['fbclid', 'gclid', 'ved', 'usg', 'sa', 'ei'])
+
+# Hosts whose pages are not worth crawling: search engines, Discord itself (its
+# invite links are extracted wherever they appear) and sites that render client-side
+SKIP_HOSTS = ('google.', 'googleusercontent.com', 'gstatic.com', 'googleapis.com',
+              'discord.gg', 'discord.com', 'discordapp.com', 'x.com', 'twitter.com')
+
+ROBOTS_AGENT = 'DiscordLinkScraper'
+
+
+def _skipped(host):
+    for skip in SKIP_HOSTS:
+        if skip.endswith('.'):
+            # Any country domain: google.com, www.google.de, ...
+            if host.startswith(skip) or '.' + skip in host:
+                return True
+        elif host == skip or host.endswith('.' + skip):
+            return True
+    return False
+
+
+def normalize_url(url):
+    """
+    Canonical form of a crawlable URL, or None: http(s) only, lowercase host,
+    no default port, fragment or tracking parameters, and a path of at least '/'.
+    """
+    parts = urlparse(url.strip())
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if _skipped(host):
+        return None
+    netloc = host
+    if parts.port and parts.port != {'http': 80, 'https': 443}[parts.scheme]:
+        netloc = f"{host}:{parts.port}"
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if key.lower() not in TRACKING_PARAMS and not key.lower().startswith('utm_')])
+    return urlunparse((parts.scheme, netloc, parts.path or '/', '', query, ''))
+
+
+def page_links(content, base_url):
+    """Absolute targets of the anchors in raw HTML bytes, Google redirects decoded, in page order."""
+    links = []
+    for match in HREF_PATTERN.finditer(content):
+        href = html.unescape(match.group(1).decode('utf-8', errors='replace'))
+        links.append(urljoin(base_url, decode_google_href(href)))
+    return links
+
+
+class CrawlFrontier:
+    def __init__(self, max_depth=0, per_domain=2):
+        """
+        max_depth 0 crawls only the search results themselves; each level above
+        follows the same-site links of the pages before it. per_domain bounds how
+        many pages of one domain a single pop_batch() hands out.
+        """
+        self.max_depth = max_depth
+        self.per_domain = max(1, per_domain)
+        self.stats = {'queued': 0, 'duplicates': 0, 'too_deep': 0, 'skipped': 0}
+        self._heap = []
+        self._seen = set()
+        self._seq = 0
+
+    def add(self, url, depth=0, rank=0, owner=None):
+        """
+        Queue url unless it was seen before in this run. Lower (depth, rank) pops
+        first; owner is handed back with the URL. Returns True if it was queued.
+        """
+        if depth > self.max_depth:
+            self.stats['too_deep'] += 1
+            return False
+        key = normalize_url(url)
+        if key is None:
+            self.stats['skipped'] += 1
+            return False
+        if key in self._seen:
+            self.stats['duplicates'] += 1
+            return False
+        self._seen.add(key)
+        self._seq += 1
+        heapq.heappush(self._heap, (depth, rank, self._seq, key, owner))
+        self.stats['queued'] += 1
+        return True
+
+    def pop_batch(self, size):
+        """Up to size (url, depth, owner) entries in priority order, at most per_domain per domain."""
+        batch = []
+        deferred = []
+        per_domain = {}
+        while self._heap and len(batch) < size:
+            entry = heapq.heappop(self._heap)
+            domain = urlparse(entry[3]).netloc
+            if per_domain.get(domain, 0) >= self.per_domain:
+                deferred.append(entry)
+                continue
+            per_domain[domain] = per_domain.get(domain, 0) + 1
+            batch.append((entry[3], entry[0], entry[4]))
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return batch
+
+    def clear(self):
+        """Drop the queued URLs; they stay seen, so later batches do not queue them again."""
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class RobotsCache:
+    def __init__(self, fetch_engine, agent=ROBOTS_AGENT):
+        """robots.txt rules per site, fetched through fetch_engine and kept for the run."""
+        self.fetch_engine = fetch_engine
+        self.agent = agent
+        self.stats = {'sites': 0, 'blocked': 0}
+        self._parsers = {}
+
+    def _load(self, origins):
+        urls = [origin + '/robots.txt' for origin in origins]
+        for origin, response in zip(origins, self.fetch_engine.fetch_all(urls, source='robots')):
+            parser = RobotFileParser()
+            if response.error is not None or response.status_code >= 500:
+                # Unreachable robots.txt: assume the whole site is off limits (RFC 9309)
+                parser.disallow_all = True
+            elif response.status_code == 200:
+                parser.parse(response.text.splitlines())
+            else:
+                # No robots.txt (4xx): everything may be crawled
+                parser.allow_all = True
+            self._parsers[origin] = parser
+            self.stats['sites'] += 1
+
+    def allowed(self, urls):
+        """The subset of urls that robots.txt lets this agent fetch, in order."""
+        origins = {}
+        for url in urls:
+            parts = urlparse(url)
+            origins[url] = f"{parts.scheme}://{parts.netloc}"
+        missing = sorted({origin for origin in origins.values() if origin not in self._parsers})
+        if missing:
+            self._load(missing)
+        allowed = [url for url in urls if self._parsers[origins[url]].can_fetch(self.agent, url)]
+        self.stats['blocked'] += len(urls) - len(allowed)
+        return allowed
@@ -3,45 +3,181 @@ Automated Discord Invite Link Scraper
 Searches x.com and articles for Discord invite links related to crypto, blockchain, NFT, game, and agent keywords.
 """
 
-import re
 import time
 import json
+import math
+import multiprocessing
 import requests
 from urllib.parse import quote_plus, urlparse
-from bs4 import BeautifulSoup
 from datetime import datetime
 import sys
+from fetch_engine import AsyncFetchEngine, DEFAULT_HEADERS, FetchResult
+from rate_controller import RateController
+from retry_policy import RETRY_STATUSES, RetryPolicy
+from crawl_frontier import CrawlFrontier, RobotsCache, page_links
+from http_cache import HTTPCache
+from link_store import LINK_STORES, LinkJournal, SQLiteLinkStore, write_link_file
+from link_sinks import LinkSinks, open_sink
+from invite_extractor import extract_invite_links, invite_code, invite_url, prefilter_raw
+from invite_set import InviteSet
+from invite_index import InviteIndex
+from invite_validator import DEFAULT_ENDPOINT, VALID, InviteValidator, ValidationCache
+from query_scheduler import SCHEDULES, QueryScheduler
+from query_planner import build_plan
+from run_checkpoint import RunCheckpoint
+from shard_coordinator import ShardCoordinator, worker_file
+from page_parser import PARSER_BACKENDS, DEFAULT_BACKEND, resolve_backend
+from parse_stage import ParseStage
+from run_metrics import MetricsServer, RunMetrics
+
+# Headers to mimic a real browser on Google search pages
+GOOGLE_HEADERS = {
+    'User-Agent': DEFAULT_HEADERS['User-Agent'],
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Referer': 'https://www.google.com/',
+}
+
+PAGE_HEADERS = {
+    'User-Agent': DEFAULT_HEADERS['User-Agent'],
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+}
 
 class DiscordLinkScraper:
     def __init__(self, output_file='invite_link.txt', use_google_api=False, api_key=None, search_engine_id=None,
-                 custom_keywords=None, custom_sites=None):
+                 custom_keywords=None, custom_sites=None, max_concurrency=4, per_host_limit=2,
+                 parser_backend=DEFAULT_BACKEND, use_prefilter=True,
+                 cache_file='http_cache.db', cache_max_mb=200, cache_ttls=None,
+                 api_cache_file='search_api_cache.db', api_cache_hours=24,
+                 api_quota_file='search_api_quota.db', api_results=10, compact_on_finish=True,
+                 link_store='text', db_file='invite_links.db', dedup_index=None, dedup_memory_mb=16,
+                 schedule='adaptive', query_stats_file='query_stats.db', explore_rate=0.2,
+                 checkpoint_file='run_checkpoint.jsonl', min_request_interval=0.5, max_request_interval=60.0,
+                 max_retries=2, crawl_pages=0, crawl_depth=0, crawl_per_domain=2, parse_workers=0,
+                 coordinator_file=None, worker_id=None, sinks=None, sink_flush_seconds=1.0,
+                 report_file='run_report.json', metrics_port=None):
         self.output_file = output_file
-        self.discord_links = set()
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
+        # Counters, stage timers and latency histograms of this run; written to
+        # report_file at the end and served on metrics_port (Prometheus) meanwhile
+        self.metrics = RunMetrics()
+        self.report_file = report_file
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+        # Known invites, held as canonical codes; membership checks accept any link form.
+        # With dedup_index (a file path) they live on disk behind a fixed-size Bloom filter
+        # instead, so memory stays bounded however large the corpus grows.
+        self.dedup_index = None
+        if dedup_index:
+            self.dedup_index = InviteIndex(dedup_index, memory_bytes=int(dedup_memory_mb * 1024 * 1024))
+        self.discord_links = self.dedup_index if self.dedup_index is not None else InviteSet()
+        
+        # 'text': checkpoints append new links to <output_file>.journal and the sorted
+        # output file is only rewritten by compact_links().
+        # 'sqlite': links and where they were found go to db_file; compact_links()
+        # exports the sorted output file.
+        if link_store == 'sqlite':
+            self.link_store = SQLiteLinkStore(db_file, export_file=output_file)
+        else:
+            self.link_store = LinkJournal(output_file)
+        self._unsaved_links = []
+        # (link, source_url, query, seen_at) for every link found since the last save;
+        # only collected when the store keeps provenance
+        self._sightings = []
+        self.compact_on_finish = compact_on_finish
+        
+        # Streaming output: each new invite goes to the sinks (see link_sinks.py) within
+        # sink_flush_seconds of being found, independently of the checkpoints
+        self.sinks = LinkSinks(sinks, flush_interval=sink_flush_seconds) if sinks else None
+        
+        # HTML parser backend: html.parser, lxml or stream (see page_parser.py)
+        self.parser_backend = resolve_backend(parser_backend)
+        # Documents that need a full parse are decoded and parsed here; with
+        # parse_workers > 0 on a process pool (-1: one process per core)
+        self.parse_stage = ParseStage(self.parser_backend, workers=parse_workers, metrics=self.metrics)
+        
+        # Raw-bytes prefilter: documents without invite markers skip decoding and parsing
+        self.use_prefilter = use_prefilter
+        self.stats = {
+            'documents': 0,
+            'prefilter_skipped': 0,   # no invite markers, never decoded or parsed
+            'prefilter_raw_only': 0,  # invites read straight from the bytes, not parsed
+            'full_parse': 0,
+        }
+        # Persistent response cache (set cache_file=None to disable)
+        self.http_cache = None
+        if cache_file:
+            self.http_cache = HTTPCache(cache_file, max_bytes=cache_max_mb * 1024 * 1024, ttls=cache_ttls)
+        
+        # Per-host pacing: intervals between requests adapt to the responses and the
+        # server's rate-limit headers, between min and max_request_interval seconds
+        self.rate_controller = RateController(min_interval=min_request_interval, max_interval=max_request_interval)
+        
+        # Failed requests are retried with jittered backoff; hosts that keep failing
+        # are skipped for a while (circuit breaker) instead of costing a timeout each time
+        self.retry_policy = RetryPolicy(max_attempts=max_retries + 1)
+        # Searches and pages that still failed, i.e. results lost this run
+        self.lost = {'searches': 0, 'pages': 0}
+        
+        # Shared fetch layer: bulk fetches and searches run concurrently,
+        # bounded globally and per host, through the response cache
+        self.fetch_engine = AsyncFetchEngine(max_concurrency=max_concurrency, per_host_limit=per_host_limit,
+                                             cache=self.http_cache, rate_controller=self.rate_controller,
+                                             retry_policy=self.retry_policy, metrics=self.metrics)
+        
+        # Crawl stage (off with crawl_pages=0): up to crawl_pages result pages per
+        # Google search are fetched and scanned, following same-site links crawl_depth deep
+        self.crawl_pages = crawl_pages
+        self.frontier = None
+        self.robots = None
+        if crawl_pages > 0:
+            self.frontier = CrawlFrontier(max_depth=crawl_depth, per_domain=crawl_per_domain)
+            self.robots = RobotsCache(self.fetch_engine)
+        self.crawl_stats = {'pages': 0, 'links': 0}
         
         # Optional: Google Custom Search API (free tier: 100 searches/day)
         self.use_google_api = use_google_api
         if use_google_api and api_key and search_engine_id:
             try:
-                from google_search_api import GoogleCustomSearchAPI
-                self.google_api = GoogleCustomSearchAPI(api_key, search_engine_id)
+                from google_search_api import GoogleCustomSearchAPI, QueryResultCache, QuotaLedger
+                # Query results are cached on disk; the CLI and GUI share the same file
+                api_cache = None
+                if api_cache_file:
+                    api_cache = QueryResultCache(api_cache_file, max_age=api_cache_hours * 3600)
+                # Daily call count shared by every process using the API
+                ledger = QuotaLedger(api_quota_file) if api_quota_file else None
+                self.google_api = GoogleCustomSearchAPI(api_key, search_engine_id, cache=api_cache, ledger=ledger,
+                                                        retry_policy=self.retry_policy,
+                                                        rate_controller=self.rate_controller,
+                                                        sleep=self.fetch_engine.idle)
                 print("Google Custom Search API enabled (100 free searches/day)")
             except:
                 self.google_api = None
                 print("Google Custom Search API not available, using free scraping method")
         else:
             self.google_api = None
+        # Queries allowed to use the API this run (None = all); set by plan_api_usage
+        self.api_plan = None
+        # Results requested per API query; above 10 pages through results, one call per page
+        self.api_results = max(1, min(api_results, 100))
+        
+        # 'adaptive' orders each run's queries by the new links they found in past runs
+        # (statistics in query_stats_file); 'fixed' keeps the generated order
+        self.scheduler = None
+        if schedule == 'adaptive' and query_stats_file:
+            self.scheduler = QueryScheduler(query_stats_file, explore_rate=explore_rate)
         
-        # Discord invite link patterns
-        self.discord_patterns = [
-            r'https?://discord\.gg/[a-zA-Z0-9-]+',
-            r'https?://discord\.com/invite/[a-zA-Z0-9-]+',
-            r'discord\.gg/[a-zA-Z0-9-]+',
-            r'discord\.com/invite/[a-zA-Z0-9-]+',
-        ]
+        # Plan and finished searches of the current run, for resuming after a crash or stop
+        self.checkpoint = RunCheckpoint(checkpoint_file) if checkpoint_file else None
+        
+        # Coordinated mode: several workers share one plan through coordinator_file,
+        # leasing searches from it and merging their links into it
+        self.coordinator = ShardCoordinator(coordinator_file, worker_id) if coordinator_file else None
+        if self.coordinator and self.report_file:
+            # Workers usually share a directory; each keeps its own report
+            self.report_file = worker_file(self.report_file, self.coordinator.worker_id)
         
         # Keywords to search for (use custom if provided)
         if custom_keywords:
@@ -60,185 +196,289 @@ class DiscordLinkScraper:
         self.load_existing_links()
     
     def load_existing_links(self):
-        """Load existing links from file to avoid duplicates."""
+        """Load existing links from the link store to avoid duplicates."""
         try:
-            with open(self.output_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    link = line.strip()
-                    if link and link.startswith('http'):
-                        self.discord_links.add(link)
-            print(f"Loaded {len(self.discord_links)} existing links from {self.output_file}")
+            if self.dedup_index is not None:
+                signature = self.link_store.signature()
+                if self.dedup_index.sync(self.link_store.iter_codes(), signature):
+                    print(f"Rebuilt dedup index {self.dedup_index.path} from the link store")
+            else:
+                self.discord_links = self.link_store.load()
         except FileNotFoundError:
             print(f"No existing file found. Starting fresh.")
+            if self.dedup_index is not None:
+                self.dedup_index.sync([], self.link_store.signature())
+            return
+        if self.discord_links:
+            source = getattr(self.link_store, 'db_file', self.output_file)
+            loaded = "Indexed" if self.dedup_index is not None else "Loaded"
+            print(f"{loaded} {len(self.discord_links)} existing links from {source}{self.link_store.describe_load()}")
+        else:
+            print(f"No existing links found. Starting fresh.")
+    
+    def add_links(self, links):
+        """Add found links to the collection. Returns the ones not seen before; they are saved at the next checkpoint."""
+        new_links = {link for link in links if self.discord_links.add(link)}
+        self._unsaved_links.extend(new_links)
+        return new_links
+    
+    def record_sightings(self, links, source_url, query=None):
+        """
+        Remember where links were found (page or search URL, Google query) for the next
+        save, and stream the ones not known yet to the sinks right away.
+        """
+        if not links:
+            return
+        seen_at = time.time()
+        if self.link_store.tracks_provenance:
+            self._sightings.extend((link, source_url, query, seen_at) for link in links)
+        if self.sinks:
+            self.sinks.emit([link for link in links if link not in self.discord_links], source_url, query, seen_at)
     
     def normalize_link(self, link):
         """Normalize Discord invite links to full URLs."""
+        code = invite_code(link)
+        if code:
+            # discord.com/invite and discordapp.com/invite normalize to discord.gg
+            return invite_url(code)
         if not link.startswith('http'):
             link = 'https://' + link
-        # Normalize discord.com/invite to discord.gg
-        link = link.replace('discord.com/invite/', 'discord.gg/')
         return link
     
     def extract_discord_links(self, text):
-        """Extract Discord invite links from text using regex patterns."""
-        links = set()
-        for pattern in self.discord_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                normalized = self.normalize_link(match)
-                if 'discord.gg/' in normalized:
-                    links.add(normalized)
-        return links
+        """Extract Discord invite links from text with the compiled invite extractor."""
+        return extract_invite_links(text)
     
-    def search_google(self, query, max_results=100):
-        """Search Google for pages containing Discord invite links."""
-        print(f"\nSearching Google for: {query}")
+    def _google_search_url(self, query, max_results=100):
+        """Build the Google search URL for a query."""
+        return f"https://www.google.com/search?q={quote_plus(query)}&num={min(max_results, 100)}&hl=en"
+    
+    def _start_extract(self, response):
+        """
+        Start extracting Discord invite links from a fetched document.
+        The raw bytes are prefiltered first; only documents with an invite marker
+        hidden in markup (or every document, with the prefilter off) go to the
+        parse stage. Returns (Future of parsed codes or None, codes read from the bytes).
+        """
+        self.stats['documents'] += 1
+        raw_codes = set()
+        if self.use_prefilter:
+            with self.metrics.timer('prefilter'):
+                raw_codes, needs_parse = prefilter_raw(response.content)
+            if not needs_parse:
+                self.stats['prefilter_raw_only' if raw_codes else 'prefilter_skipped'] += 1
+                return None, raw_codes
+        
+        self.stats['full_parse'] += 1
+        # The parse is authoritative: a raw match next to a hidden marker may be cut short
+        return self.parse_stage.submit(response.content, response.encoding), set()
+    
+    def _finish_extract(self, started):
+        """Wait for an extraction begun by _start_extract; returns its set of invite links."""
+        if isinstance(started, Exception):
+            raise started
+        parsed, codes = started
+        if parsed is not None:
+            codes = codes | set(parsed.result())
+        return {invite_url(code) for code in codes}
+    
+    def _fetch_extract(self, urls, headers=None, source='page'):
+        """
+        Fetch urls concurrently and hand each successful response to the parse stage as
+        soon as it arrives, so parsing overlaps the remaining fetches. Returns one
+        (FetchResult, started extraction or None) pair per URL, in order.
+        """
+        started = {}
+        
+        def on_fetched(index, response):
+            if isinstance(response, FetchResult) and response.ok:
+                try:
+                    started[index] = self._start_extract(response)
+                except Exception as e:
+                    started[index] = e
+        
+        responses = self.fetch_engine.fetch_all(urls, headers=headers, callback=on_fetched, source=source)
+        return [(response, started.get(i)) for i, response in enumerate(responses)]
+    
+    def prefilter_summary(self):
+        """Describe how many documents took the prefilter fast path this run."""
+        s = self.stats
+        fast = s['prefilter_skipped'] + s['prefilter_raw_only']
+        return (f"Documents: {s['documents']} | fast path: {fast} "
+                f"({s['prefilter_skipped']} skipped, {s['prefilter_raw_only']} read from raw bytes) | "
+                f"full parse: {s['full_parse']}")
+    
+    def _search_google_api(self, query):
+        """
+        Page through API results for one query, extracting links from each page as it arrives.
+        Returns the links, the result URLs in rank order and (links, result URL) per result.
+        """
         links_found = set()
+        result_urls = []
+        sightings = []
+        start = time.perf_counter()
+        for items in self.google_api.search_batch(query, self.api_results):
+            self.metrics.add_time('fetch_api', time.perf_counter() - start)
+            for result in items:
+                # Extract from title, link, and snippet
+                links = self.extract_discord_links(f"{result['title']} {result['link']} {result['snippet']}")
+                # Recorded by the caller: the dedup index may only be read from the main thread
+                sightings.append((links, result['link']))
+                links_found.update(links)
+                result_urls.append(result['link'])
+            start = time.perf_counter()
+        return links_found, result_urls, sightings
+    
+    def _search_google_api_many(self, queries):
+        """
+        Run Custom Search API queries concurrently; returns one (links, result URLs,
+        sightings) triple per query, or None on error.
+        """
+        results = []
+        for result in self.fetch_engine.map(self._search_google_api, queries, host='www.googleapis.com'):
+            if isinstance(result, Exception):
+                print(f"Google API error: {str(result)}")
+                results.append(None)
+            else:
+                results.append(result)
+        return results
+    
+    def plan_api_usage(self, queries):
+        """
+        Plan which Google queries of this run get Custom Search API calls, print the
+        remaining budget and where it is projected to run out. Takes (source_type, query) pairs.
+        """
+        if not (self.google_api and self.google_api.is_available()):
+            return None
+        google_queries = []
+        # Google query -> expected new links per request of the search it belongs to
+        expected = {}
+        for source_type, query in queries:
+            for google_query in self._expand_query(source_type, query):
+                if google_query not in google_queries:
+                    google_queries.append(google_query)
+                    if self.scheduler and query in self.scheduler.expected:
+                        expected[google_query] = self.scheduler.expected[query]
+        
+        # Quota goes to the queries expected to find the most new links; without
+        # any history (no estimates) it goes in run order
+        value = (lambda q: expected.get(q, 0.0)) if expected else None
+        plan = self.google_api.plan(google_queries, value=value, num_results=self.api_results)
+        self.api_plan = plan['api'] | set(plan['cached'])
         
-        # Try Google Custom Search API first if available
+        ledger = self.google_api.ledger
+        if ledger:
+            print(f"API budget: {ledger.used()}/{ledger.daily_quota} used today, {plan['remaining']} remaining "
+                  f"(resets {ledger.next_reset().strftime('%Y-%m-%d %H:%M %Z')})")
+        print(f"API plan: {len(plan['api'])} queries ({plan['calls']} API calls), {len(plan['cached'])} answered from cache, "
+              f"{len(plan['fallback'])} left to HTML scraping")
+        if plan['exhausted_at'] is not None:
+            print(f"Quota projected to run out at Google query {plan['exhausted_at']} of {len(google_queries)}")
+        else:
+            print(f"Projected quota left after this run: {plan['remaining'] - plan['calls']}")
+        return plan
+    
+    def search_google_many(self, queries, max_results=100, result_urls=None, failed=None):
+        """
+        Search Google for several queries concurrently; returns one link set per query.
+        If result_urls is a list (one list per query), the result URLs of each search are added to it.
+        If failed is a set, the indexes of the searches that failed (lost results) are added to it.
+        """
+        for query in queries:
+            print(f"\nSearching Google for: {query}")
+        results = [set() for _ in queries]
+        pending = list(range(len(queries)))
+        
+        # Try Google Custom Search API first if available and planned for these queries
         if self.google_api and self.google_api.is_available():
-            try:
-                results = self.google_api.search(query, num_results=10)
-                for result in results:
-                    # Extract from title, link, and snippet
-                    text = f"{result['title']} {result['link']} {result['snippet']}"
-                    discord_links = self.extract_discord_links(text)
-                    links_found.update(discord_links)
-                
-                if links_found:
-                    print(f"Found {len(links_found)} Discord links via Google API")
-                    return links_found
-            except Exception as e:
-                print(f"Google API error, falling back to scraping: {str(e)}")
+            api_indexes = [i for i, query in enumerate(queries)
+                           if self.api_plan is None or query in self.api_plan]
+            api_results = self._search_google_api_many([queries[i] for i in api_indexes])
+            pending = [i for i in range(len(queries)) if i not in set(api_indexes)]
+            # Planned searches were budgeted as API calls only; an HTML fallback
+            # would send requests beyond the plan (and -n), so only unplanned ones fall back
+            fallback = self.api_plan is None
+            for i, api_result in zip(api_indexes, api_results):
+                if api_result is None:
+                    if fallback:
+                        pending.append(i)
+                    else:
+                        self.lost['searches'] += 1
+                        if failed is not None:
+                            failed.add(i)
+                    continue
+                for links, url in api_result[2]:
+                    self.record_sightings(links, url, queries[i])
+                if result_urls is not None:
+                    result_urls[i].extend(api_result[1])
+                if api_result[0]:
+                    print(f"Found {len(api_result[0])} Discord links via Google API")
+                    results[i] = api_result[0]
+                elif fallback:
+                    pending.append(i)
+            pending.sort()
         
         # Fallback to free Google search scraping
-        try:
-            # Google search URL with proper parameters
-            search_url = f"https://www.google.com/search?q={quote_plus(query)}&num={min(max_results, 100)}&hl=en"
-            
-            # Add headers to mimic a real browser
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Referer': 'https://www.google.com/',
-            }
-            
-            response = self.session.get(search_url, headers=headers, timeout=15)
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Method 1: Extract from search result snippets and URLs
-                # Google search results are in divs with class 'g' or similar
-                for result in soup.find_all(['div', 'a'], class_=lambda x: x and ('g' in str(x).lower() or 'result' in str(x).lower())):
-                    # Extract text content
-                    text = result.get_text()
-                    discord_links = self.extract_discord_links(text)
-                    links_found.update(discord_links)
-                    
-                    # Extract from href attributes
-                    if result.name == 'a' and result.get('href'):
-                        href = result.get('href')
-                        # Google search result links start with /url?q=
-                        if '/url?q=' in href:
-                            # Extract actual URL
-                            try:
-                                actual_url = href.split('/url?q=')[1].split('&')[0]
-                                discord_links = self.extract_discord_links(actual_url)
-                                links_found.update(discord_links)
-                            except:
-                                pass
-                        else:
-                            discord_links = self.extract_discord_links(href)
-                            links_found.update(discord_links)
-                
-                # Method 2: Extract from all links
-                for link in soup.find_all('a', href=True):
-                    href = link.get('href', '')
-                    # Handle Google's URL redirect format
-                    if '/url?q=' in href:
-                        try:
-                            actual_url = href.split('/url?q=')[1].split('&')[0]
-                            # Extract Discord links from the actual URL
-                            discord_links = self.extract_discord_links(actual_url)
-                            links_found.update(discord_links)
-                        except:
-                            pass
-                    else:
-                        discord_links = self.extract_discord_links(href)
-                        links_found.update(discord_links)
-                    
-                    # Extract from link text
-                    text = link.get_text()
-                    discord_links = self.extract_discord_links(text)
-                    links_found.update(discord_links)
-                
-                # Method 3: Extract from entire page text (snippets, descriptions)
-                page_text = soup.get_text()
-                discord_links = self.extract_discord_links(page_text)
-                links_found.update(discord_links)
-                
-                # Method 4: Look for specific Google result patterns
-                # Google often shows snippets with URLs
-                for snippet in soup.find_all(['span', 'div'], class_=lambda x: x and ('snippet' in str(x).lower() or 'st' in str(x).lower())):
-                    text = snippet.get_text()
-                    discord_links = self.extract_discord_links(text)
-                    links_found.update(discord_links)
-                
-                print(f"Found {len(links_found)} Discord links from Google search")
+        urls = [self._google_search_url(queries[i], max_results) for i in pending]
+        for i, (response, extraction) in zip(pending, self._fetch_extract(urls, headers=GOOGLE_HEADERS, source='serp')):
+            if not response.ok:
+                self.lost['searches'] += 1
+                if failed is not None:
+                    failed.add(i)
+            if isinstance(response.error, requests.exceptions.Timeout):
+                print(f"Request timed out after retries: {queries[i]}")
+            elif response.error is not None:
+                print(f"Error searching Google: {str(response.error)}")
+            elif response.status_code == 200:
+                if result_urls is not None:
+                    result_urls[i].extend(page_links(response.content, response.url))
+                try:
+                    results[i] = self._finish_extract(extraction)
+                    self.record_sightings(results[i], response.url, queries[i])
+                    print(f"Found {len(results[i])} Discord links from Google search")
+                except Exception as e:
+                    print(f"Error searching Google: {str(e)}")
+                    import traceback
+                    traceback.print_exc()
             else:
                 print(f"Google search returned status code: {response.status_code}")
                 if response.status_code == 429:
-                    print("Rate limited by Google. Waiting 60 seconds...")
-                    time.sleep(60)
-        
-        except requests.exceptions.Timeout:
-            print("Request timed out. Retrying...")
-            time.sleep(5)
-        except Exception as e:
-            print(f"Error searching Google: {str(e)}")
-            import traceback
-            traceback.print_exc()
+                    # The rate controller has already slowed Google down and
+                    # pauses it for as long as Retry-After asks
+                    print(f"Rate limited by Google; now {self.rate_controller.rate(urlparse(response.url).netloc.lower()):.2f} requests/s")
         
-        return links_found
+        return results
+    
+    def search_google(self, query, max_results=100):
+        """Search Google for pages containing Discord invite links."""
+        return self.search_google_many([query], max_results)[0]
+    
+    def scrape_web_pages(self, urls, queries=None, follow=None):
+        """
+        Scrape several web pages concurrently; returns a dict of url -> Discord links.
+        queries optionally maps a url to the Google query that led to it (for provenance);
+        if follow is a dict, it receives url -> the links on that page.
+        """
+        pages = {}
+        for url, (response, extraction) in zip(urls, self._fetch_extract(urls, headers=PAGE_HEADERS)):
+            pages[url] = set()
+            if response.error is not None or response.status_code in RETRY_STATUSES:
+                self.lost['pages'] += 1
+            if response.error is not None:
+                print(f"Error scraping {url}: {str(response.error)}")
+            elif response.status_code == 200:
+                try:
+                    pages[url] = self._finish_extract(extraction)
+                    self.record_sightings(pages[url], url, queries.get(url) if queries else None)
+                except Exception as e:
+                    print(f"Error scraping {url}: {str(e)}")
+                if follow is not None:
+                    follow[url] = page_links(response.content, url)
+        return pages
     
     def scrape_web_page(self, url):
         """Scrape a web page for Discord invite links."""
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            }
-            response = self.session.get(url, headers=headers, timeout=15)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Extract from all text content
-                text = soup.get_text()
-                links = self.extract_discord_links(text)
-                
-                # Extract from all links
-                for link_tag in soup.find_all('a', href=True):
-                    href = link_tag.get('href', '')
-                    # Handle relative URLs
-                    if href.startswith('/'):
-                        href = urlparse(url).scheme + '://' + urlparse(url).netloc + href
-                    links.update(self.extract_discord_links(href))
-                
-                # Extract from meta tags
-                for meta in soup.find_all('meta', content=True):
-                    content = meta.get('content', '')
-                    links.update(self.extract_discord_links(content))
-                
-                return links
-        except Exception as e:
-            print(f"Error scraping {url}: {str(e)}")
-        
-        return set()
+        return self.scrape_web_pages([url])[url]
     
     def search_x_com_via_google(self, query):
         """Search x.com via Google search."""
@@ -249,25 +489,109 @@ class DiscordLinkScraper:
             x_query = f'site:x.com {query}'
         return self.search_google(x_query)
     
+    def _expand_query(self, source_type, query):
+        """Return the Google queries that one (source_type, query) pair expands to."""
+        if source_type == 'x.com':
+            # Remove duplicate site:x.com if already present
+            return [query if 'site:x.com' in query else f'site:x.com {query}']
+        # Generated article queries already name their site; only a bare query
+        # is spread over the custom sites (x.com is handled separately)
+        if 'site:' in query:
+            return [query]
+        return [f'site:{site} {query}' for site in self.custom_sites if site != 'x.com']
+    
+    def _request_cost(self, google_query):
+        """(HTTP requests, how it is served) for one Google query under the current API plan and caches."""
+        if self.google_api and self.google_api.is_available() and (self.api_plan is None or google_query in self.api_plan):
+            if self.google_api.is_cached(google_query, self.api_results):
+                return 0, 'api-cache'
+            return math.ceil(self.api_results / 10), 'api'
+        if self.http_cache and self.http_cache.has_fresh(self._google_search_url(google_query), 'serp'):
+            return 0, 'cache'
+        return 1, 'html'
+    
     def search_articles(self, query):
         """Search articles and blog posts for Discord links."""
-        # Use custom sites if provided
-        article_sites = []
-        for site in self.custom_sites:
-            if site != 'x.com':  # x.com is handled separately
-                article_sites.append(f'site:{site}')
-        
         all_links = set()
-        
-        for site in article_sites:
-            search_query = f'{site} {query}'
-            print(f"\nSearching {site} for: {query}")
-            links = self.search_google(search_query)
+        for links in self.search_google_many(self._expand_query('articles', query)):
             all_links.update(links)
-            time.sleep(2)  # Rate limiting
-        
         return all_links
     
+    def crawl_results(self, google_queries, result_urls, results):
+        """
+        Crawl stage: queue the result URLs of each Google query in the frontier and fetch
+        up to crawl_pages pages per query, robots.txt permitting. Links found on a page are
+        added to the results of the query that led to it.
+        """
+        frontier = self.frontier
+        for owner, urls in enumerate(result_urls):
+            for rank, url in enumerate(urls):
+                frontier.add(url, depth=0, rank=rank, owner=owner)
+        # Pages left per query: one query's results (and the pages they link to) cannot
+        # use up the pages of the others
+        budgets = [self.crawl_pages] * len(google_queries)
+        while any(budgets) and len(frontier):
+            batch = frontier.pop_batch(min(sum(budgets), self.fetch_engine.max_concurrency))
+            # Pages of queries that have used their budget are dropped (they stay seen)
+            batch = [(url, depth, owner) for url, depth, owner in batch if budgets[owner] > 0]
+            origin = {url: (depth, owner) for url, depth, owner in batch}
+            urls = self.robots.allowed([url for url, _, _ in batch])
+            allowed = []
+            for url in urls:
+                owner = origin[url][1]
+                if budgets[owner] > 0:
+                    budgets[owner] -= 1
+                    allowed.append(url)
+            urls = allowed
+            follow = {} if frontier.max_depth else None
+            pages = self.scrape_web_pages(urls, {url: google_queries[origin[url][1]] for url in urls}, follow)
+            for url, links in pages.items():
+                depth, owner = origin[url]
+                results[owner].update(links)
+                self.crawl_stats['pages'] += 1
+                self.crawl_stats['links'] += len(links)
+                # Deeper levels stay on the site of the result page
+                host = urlparse(url).netloc
+                for rank, link in enumerate((follow or {}).get(url, ())):
+                    if urlparse(link).netloc.lower() == host:
+                        frontier.add(link, depth=depth + 1, rank=rank, owner=owner)
+        # Leftovers belong to this batch's searches; they stay seen, so they are not queued again
+        frontier.clear()
+    
+    def crawl_summary(self):
+        s = self.crawl_stats
+        f = self.frontier.stats
+        return (f"Crawl: {s['pages']} pages fetched, {s['links']} invite links found in them | frontier: "
+                f"{f['queued']} queued, {f['duplicates']} duplicates, {f['too_deep']} too deep | "
+                f"robots.txt: {self.robots.stats['sites']} sites, {self.robots.stats['blocked']} pages blocked")
+    
+    def search_queries(self, queries, failed=None):
+        """
+        Run a batch of (source_type, query) searches concurrently; returns one link set per query.
+        If failed is a set, the indexes of the queries with a failed Google search are added to it.
+        """
+        expanded = [self._expand_query(source_type, query) for source_type, query in queries]
+        google_queries = [q for group in expanded for q in group]
+        result_urls = [[] for _ in google_queries] if self.frontier is not None else None
+        failed_google = set()
+        with self.metrics.timer('search'):
+            flat_results = self.search_google_many(google_queries, result_urls=result_urls, failed=failed_google)
+        if self.frontier is not None:
+            with self.metrics.timer('crawl'):
+                self.crawl_results(google_queries, result_urls, flat_results)
+        
+        results = []
+        position = 0
+        for index, group in enumerate(expanded):
+            links = set()
+            for group_links in flat_results[position:position + len(group)]:
+                links.update(group_links)
+            if failed is not None and failed_google.intersection(range(position, position + len(group))):
+                failed.add(index)
+            position += len(group)
+            results.append(links)
+        return results
+    
     def generate_search_queries(self):
         """Generate various search queries based on selected keywords and sites."""
         queries = []
@@ -297,66 +621,404 @@ class DiscordLinkScraper:
         
         return queries
     
-    def run(self, max_searches=50):
-        """Run the scraper."""
+    def plan_queries(self, max_requests):
+        """
+        Plan this run: the scheduled queries, one Google search per (site, keyword set),
+        cut where the real HTTP requests they cost reach max_requests. Returns a QueryPlan.
+        """
+        queries = self.generate_search_queries()
+        if self.scheduler:
+            # The scheduled searches first, then the rest in generated order: max_requests
+            # counts HTTP requests, so cached searches further down still fit in the plan
+            scheduled = self.scheduler.schedule(queries, max_requests)
+            picked = set(scheduled)
+            queries = scheduled + [pair for pair in queries if pair not in picked]
+        self.plan_api_usage(queries)
+        return build_plan(queries, self._expand_query, self._request_cost, max_requests)
+    
+    def plan_pace(self):
+        """(requests in flight, seconds between requests) to Google right now, for plan estimates."""
+        concurrency = min(self.fetch_engine.max_concurrency, self.fetch_engine.per_host_limit)
+        return concurrency, self.rate_controller.interval(urlparse(self._google_search_url('')).netloc)
+    
+    def record_yield(self, search, new_links):
+        """Feed a finished PlannedSearch's new-link count back to the scheduler (and the metrics)."""
+        self.metrics.count('searches')
+        self.metrics.count('new_links', len(new_links))
+        if self.scheduler:
+            # Cached searches cost no request but still count as one search
+            self.scheduler.record(search.source_type, search.query, max(search.requests, 1), len(new_links))
+    
+    def summary_lines(self):
+        """Per-stage summary lines for the end of a run."""
+        lines = [self.prefilter_summary(), self.parse_stage.summary(), self.rate_controller.summary(),
+                 f"{self.retry_policy.summary()} | lost: {self.lost['searches']} searches, {self.lost['pages']} pages"]
+        if self.http_cache:
+            lines.append(self.http_cache.summary())
+        if self.google_api and self.google_api.cache:
+            lines.append(self.google_api.cache.summary())
+        if self.frontier is not None:
+            lines.append(self.crawl_summary())
+        if self.dedup_index is not None:
+            lines.append(self.dedup_index.summary())
+        if self.scheduler:
+            lines.append(self.scheduler.summary())
+        if self.coordinator:
+            lines.append(self.coordinator.summary())
+        if self.sinks:
+            lines.append(self.sinks.summary())
+        if self.google_api and self.google_api.ledger:
+            lines.append(f"API quota remaining today: {self.google_api.ledger.remaining()}/{self.google_api.ledger.daily_quota}")
+        return lines
+    
+    def run_report(self):
+        """Component statistics for the run report, next to the metrics' counters, timers and histograms."""
+        requests_sent = self.retry_policy.stats['requests']
+        new_links = self.metrics.counter('new_links')
+        report = {
+            'links': {'known': len(self.discord_links), 'new': new_links,
+                      'new_per_request': round(new_links / requests_sent, 4) if requests_sent else None,
+                      'lost_searches': self.lost['searches'], 'lost_pages': self.lost['pages']},
+            'prefilter': dict(self.stats),
+            'parse_stage': dict(self.parse_stage.stats, workers=self.parse_stage.workers),
+            'retries': dict(self.retry_policy.stats, circuit_trips=self.retry_policy.breaker.trips,
+                            open_circuits=self.retry_policy.breaker.open_hosts()),
+            'rate_control': self.rate_controller.host_stats(),
+        }
+        if self.http_cache:
+            report['http_cache'] = dict(self.http_cache.stats)
+        if self.google_api and self.google_api.cache:
+            report['api_cache'] = dict(self.google_api.cache.stats)
+        if self.frontier is not None:
+            report['crawl'] = dict(self.crawl_stats, frontier=dict(self.frontier.stats), robots=dict(self.robots.stats))
+        if self.dedup_index is not None:
+            report['dedup_index'] = dict(self.dedup_index.stats)
+        if self.coordinator:
+            report['coordinator'] = dict(self.coordinator.stats, worker=self.coordinator.worker_id)
+        if self.sinks:
+            report['sinks'] = dict(self.sinks.stats)
+        return report
+    
+    def write_report(self):
+        """Write the JSON run report to report_file (if set)."""
+        if not self.report_file:
+            return
+        try:
+            self.metrics.write_report(self.report_file, self.run_report())
+        except OSError as e:
+            print(f"Could not write run report {self.report_file}: {str(e)}")
+    
+    def serve_metrics(self):
+        """Serve the live metrics in the Prometheus text format on metrics_port (127.0.0.1) until close_metrics()."""
+        if self.metrics_port and self.metrics_server is None:
+            gauges = lambda: {'links_known': len(self.discord_links), 'links_unsaved': len(self._unsaved_links)}
+            self.metrics_server = MetricsServer(self.metrics, self.metrics_port, gauges=gauges)
+            print(f"Serving metrics at {self.metrics_server.url}")
+    
+    def close_metrics(self):
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+            self.metrics_server = None
+    
+    def start_run(self, max_requests, resume=False):
+        """
+        Plan a run, or with resume pick up the checkpointed one. Returns the plan and
+        the searches still to run; a resumed run skips every search already finished.
+        """
+        if resume and self.checkpoint:
+            state = self.checkpoint.load()
+            if state:
+                plan, done, header = state
+                # Searches keep the API/HTML choice they were planned with
+                self.api_plan = {q for search in plan.searches if 'api' in search.via for q in search.google_queries}
+                if self.scheduler:
+                    self.scheduler.restore(header['expected'], header['explored'])
+                print(f"Resuming run from {self.checkpoint.path}: {len(done)}/{len(plan.searches)} searches already done")
+                return plan, [search for search in plan.searches if search.index not in done]
+            print(f"No checkpoint found at {self.checkpoint.path}. Starting a new run.")
+        elif self.checkpoint and self.checkpoint.exists():
+            print(f"Replacing the checkpoint of an unfinished run ({self.checkpoint.path}); use --resume to continue one")
+        plan = self.plan_queries(max_requests)
+        if self.checkpoint:
+            if self.scheduler:
+                self.checkpoint.start(plan, self.scheduler.expected, self.scheduler.explored)
+            else:
+                self.checkpoint.start(plan)
+        return plan, list(plan.searches)
+    
+    def run_batch(self, batch):
+        """
+        Search a batch of PlannedSearch concurrently, store what was found and checkpoint
+        the batch. Returns the new links of each search, None for a search that failed.
+        """
+        failed = set()
+        batch_results = self.search_queries([(search.source_type, search.query) for search in batch], failed)
+        new_per_search = []
+        for i, (search, links) in enumerate(zip(batch, batch_results)):
+            new_links = self.add_links(links)
+            if i in failed:
+                # Its yield is unknown until the retry; what it did find is kept
+                new_per_search.append(None)
+                continue
+            self.record_yield(search, new_links)
+            new_per_search.append(new_links)
+        # Links are durable before the batch is marked done: a crash in between
+        # repeats this one batch on resume (served from the HTTP cache), never loses it
+        self.save_links()
+        if self.checkpoint:
+            # Failed searches stay out of the checkpoint, so a resumed run retries them
+            self.checkpoint.mark_done([(search.index, links) for i, (search, links) in enumerate(zip(batch, batch_results))
+                                       if i not in failed])
+        return new_per_search
+    
+    def finish_run(self, completed=True):
+        """Final save and compaction; a completed run also drops its checkpoint."""
+        self.save_links()
+        if self.compact_on_finish:
+            self.compact_links()
+        self.parse_stage.close()
+        self.fetch_engine.close()
+        if self.sinks:
+            self.sinks.flush()
+        if completed and self.checkpoint:
+            self.checkpoint.finish()
+        self.write_report()
+    
+    def run(self, max_searches=50, resume=False):
+        """Run the scraper. max_searches bounds the Google HTTP requests made."""
+        if self.coordinator:
+            return self.run_coordinated(max_searches)
         print("=" * 60)
         print("Discord Invite Link Scraper")
         print("=" * 60)
         print(f"Starting with {len(self.discord_links)} existing links")
-        print(f"Will perform up to {max_searches} searches")
+        print(f"Will perform up to {max_searches} Google requests")
         print("=" * 60)
         
-        queries = self.generate_search_queries()
-        total_searches = min(len(queries), max_searches)
+        plan, searches = self.start_run(max_searches, resume)
+        total_searches = len(plan.searches)
+        batch_size = self.fetch_engine.max_concurrency
+        # A resumed run counts only the searches it still has to make
+        for line in plan.summary_lines(*self.plan_pace(), searches=searches):
+            print(line)
         
-        for i, (source_type, query) in enumerate(queries[:total_searches], 1):
-            print(f"\n[{i}/{total_searches}] Searching {source_type}: {query}")
+        # Queries run in batches of max_concurrency; the fetch engine keeps
+        # per-host limits so a batch never floods a single host
+        completed = True
+        for start in range(0, len(searches), batch_size):
+            batch = searches[start:start + batch_size]
+            for search in batch:
+                print(f"\n[{search.index + 1}/{total_searches}] Searching {search.source_type}: {search.query}")
             
             try:
-                if source_type == 'x.com':
-                    links = self.search_x_com_via_google(query)
-                else:
-                    links = self.search_articles(query)
-                
-                new_links = links - self.discord_links
-                self.discord_links.update(links)
-                
-                if new_links:
+                new_per_search = self.run_batch(batch)
+            except Exception as e:
+                print(f"Error processing query: {str(e)}")
+                # Not checkpointed, so a resumed run retries this batch
+                completed = False
+                continue
+            
+            for new_links in new_per_search:
+                if new_links is None:
+                    print("Search failed; run with --resume to retry it")
+                    completed = False
+                elif new_links:
                     print(f"Found {len(new_links)} new links!")
                     for link in new_links:
                         print(f"  - {link}")
                 else:
                     print("No new links found")
-                
-                # Save periodically
-                if i % 10 == 0:
-                    self.save_links()
-                    print(f"\nProgress saved: {len(self.discord_links)} total links")
-                
-                # Rate limiting - random delay to avoid detection
-                import random
-                delay = random.uniform(2, 5)
-                time.sleep(delay)
-                
-            except Exception as e:
-                print(f"Error processing query: {str(e)}")
-                continue
+            print(f"\nProgress saved: {len(self.discord_links)} total links")
         
-        # Final save
-        self.save_links()
+        self.finish_run(completed)
         
         print("\n" + "=" * 60)
         print(f"Scraping completed!")
         print(f"Total unique Discord invite links: {len(self.discord_links)}")
         print(f"Links saved to: {self.output_file}")
+        if self.link_store.tracks_provenance:
+            print(f"Link database: {self.link_store.db_file}")
+        if not completed and self.checkpoint:
+            print(f"Some searches failed; run with --resume to retry them")
+        for line in self.summary_lines():
+            print(line)
+        if self.report_file:
+            print(f"Run report: {self.report_file}")
+        print("=" * 60)
+    
+    def run_coordinated(self, max_searches=50):
+        """
+        Run as one of several workers sharing self.coordinator. The first worker plans the
+        run (max_searches Google requests for all workers together); every worker then leases
+        batches of searches until none are left. At the end each worker writes the links
+        merged from all workers to its link store, one worker at a time.
+        """
+        coordinator = self.coordinator
+        print("=" * 60)
+        print(f"Discord Invite Link Scraper - worker {coordinator.worker_id}")
+        print("=" * 60)
+        print(f"Starting with {len(self.discord_links)} existing links")
+        # No plan yet, or every search of the last run is done: this worker plans a new run
+        if not coordinator.has_plan() or coordinator.finished():
+            plan = self.plan_queries(max_searches)
+            expected, explored = (self.scheduler.expected, self.scheduler.explored) if self.scheduler else ({}, ())
+            restart = coordinator.has_plan()
+            if coordinator.publish_plan(plan, expected, explored, seed_codes=self.discord_links.codes()):
+                if restart:
+                    print(f"The previous run in {coordinator.path} is finished; starting a new one")
+                print(f"Published a plan of {len(plan.searches)} searches to {coordinator.path}")
+                for line in plan.summary_lines(*self.plan_pace()):
+                    print(line)
+        if self.scheduler:
+            self.scheduler.restore(*coordinator.plan_estimates())
+        print("=" * 60)
+        
+        batch_size = self.fetch_engine.max_concurrency
+        completed = True
+        batch = []
+        try:
+            while True:
+                batch = coordinator.lease(batch_size)
+                if not batch:
+                    break
+                for search in batch:
+                    print(f"\n[{search.index + 1}] Searching {search.source_type}: {search.query}")
+                # Searches keep the API/HTML choice they were planned with
+                self.api_plan = {q for search in batch if 'api' in search.via for q in search.google_queries}
+                failed = set()
+                try:
+                    batch_results = self.search_queries([(search.source_type, search.query) for search in batch], failed)
+                except Exception as e:
+                    print(f"Error processing query: {str(e)}")
+                    coordinator.release(batch, failed=True)
+                    batch = []
+                    completed = False
+                    continue
+                if failed:
+                    # Failed searches go back to the pool as failed attempts; what they found is kept
+                    self.add_links(set().union(*(batch_results[i] for i in failed)))
+                    coordinator.release([batch[i] for i in failed], failed=True)
+                    completed = False
+                    batch_results = [links for i, links in enumerate(batch_results) if i not in failed]
+                    batch = [search for i, search in enumerate(batch) if i not in failed]
+                # Only links no worker has reported yet count as new
+                new_per_search = coordinator.complete(zip(batch, batch_results))
+                for search, new_links in zip(batch, new_per_search):
+                    self.add_links(new_links)
+                    self.record_yield(search, new_links)
+                    if new_links:
+                        print(f"Found {len(new_links)} new links!")
+                        for link in new_links:
+                            print(f"  - {link}")
+                batch = []
+                # The SQLite store takes upserts from every worker; text stores are
+                # written once at the end, from the coordinator
+                if self.link_store.tracks_provenance:
+                    self.save_links()
+        finally:
+            # Stopped mid-batch: let another worker take these searches now
+            if batch:
+                coordinator.release(batch)
+        
+        with coordinator.exclusive():
+            self.add_links(coordinator.urls())
+            if self.compact_on_finish:
+                self.compact_links()
+            else:
+                self.save_links()
+        self.parse_stage.close()
+        self.fetch_engine.close()
+        if self.sinks:
+            self.sinks.flush()
+        self.write_report()
+        
+        print("\n" + "=" * 60)
+        print(f"Worker finished: no searches left to lease")
+        print(f"Total unique Discord invite links: {len(self.discord_links)}")
+        print(f"Links saved to: {self.output_file}")
+        if not completed:
+            print(f"Some searches failed; they are retried by the next worker to lease them")
+        for line in self.summary_lines():
+            print(line)
+        if self.report_file:
+            print(f"Run report: {self.report_file}")
         print("=" * 60)
     
     def save_links(self):
-        """Save all collected links to file."""
-        sorted_links = sorted(self.discord_links)
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            for link in sorted_links:
-                f.write(f"{link}\n")
+        """Checkpoint: durably write the links (and sightings) found since the last save to the link store."""
+        with self.metrics.timer('save'):
+            sightings, self._sightings = self._sightings, []
+            self.link_store.save(self._unsaved_links, sightings)
+            self._unsaved_links = []
+            self._mark_index_synced()
+    
+    def compact_links(self):
+        """Rewrite the output file as the sorted canonical link list (clears the journal of the text store)."""
+        self.save_links()
+        with self.metrics.timer('compact'):
+            self.link_store.compact(self.discord_links)
+            self._mark_index_synced()
+    
+    def _mark_index_synced(self):
+        """The dedup index already holds everything just written; skip the rebuild next run."""
+        if self.dedup_index is not None:
+            self.dedup_index.mark_synced(self.link_store.signature())
+    
+    def merge_link_files(self, paths):
+        """
+        Merge other link files (any invite form) into the link store, streaming them so
+        that only the dedup index has to fit in memory. Returns the number of new links.
+        """
+        merged = 0
+        for path in paths:
+            try:
+                codes = LinkJournal(path).iter_codes()
+                new_in_file = 0
+                for code in codes:
+                    if self.discord_links.add_code(code):
+                        self._unsaved_links.append(invite_url(code))
+                        new_in_file += 1
+                        if len(self._unsaved_links) >= 10000:
+                            self.save_links()
+            except FileNotFoundError:
+                print(f"Link file not found: {path}")
+                continue
+            self.save_links()
+            print(f"Merged {path}: {new_in_file} new links")
+            merged += new_in_file
+        return merged
+
+    def validate_links(self, endpoint=DEFAULT_ENDPOINT, cache_file='invite_status.db', valid_output=None):
+        """
+        Check every known invite against the invite endpoint, reusing cached results
+        that are still fresh. Optionally writes the valid invites to valid_output.
+        """
+        cache = ValidationCache(cache_file) if cache_file else None
+        # The validator paces the invite API with its own controller: the scraper's
+        # bounds are meant for scraped sites, not for an API that states its quota
+        validator = InviteValidator(endpoint, cache=cache, max_concurrency=self.fetch_engine.max_concurrency)
+        valid = []
+        total = len(self.discord_links)
+        for i, status in enumerate(validator.validate(self.discord_links.codes()), 1):
+            if status.state == VALID:
+                valid.append(invite_url(status.code))
+            if i % validator.batch_size == 0:
+                print(f"Validated {i}/{total}: {validator.summary()}")
+        if valid_output:
+            # Codes are validated in sorted order, so the list is already sorted
+            write_link_file(valid_output, valid)
+            print(f"Valid invites saved to: {valid_output}")
+        print(validator.summary())
+        validator.engine.close()
+        if cache:
+            cache.close()
+        return validator.stats
+
+def print_stored_links(rows):
+    """Print (link, first_seen) rows from a link database lookup."""
+    for link, first_seen in rows:
+        print(f"{datetime.fromtimestamp(first_seen).strftime('%Y-%m-%d %H:%M')}  {link}")
+    print(f"{len(rows)} links")
 
 def main():
     """Main function."""
@@ -364,13 +1026,116 @@ def main():
     
     parser = argparse.ArgumentParser(description='Scrape Discord invite links from x.com and articles')
     parser.add_argument('-o', '--output', default='invite_link.txt', help='Output file (default: invite_link.txt)')
-    parser.add_argument('-n', '--max-searches', type=int, default=50, help='Maximum number of searches (default: 50)')
+    parser.add_argument('-n', '--max-searches', type=int, default=50,
+                        help='Maximum number of Google HTTP requests; cached searches are free (default: 50)')
     parser.add_argument('--use-api', action='store_true', help='Use Google Custom Search API (requires API key)')
     parser.add_argument('--api-key', default=None, help='Google Custom Search API key')
     parser.add_argument('--search-engine-id', default=None, help='Google Custom Search Engine ID')
+    parser.add_argument('--api-results', type=int, default=10,
+                        help='Results per API query, up to 100; each 10 costs one API call (default: 10)')
+    parser.add_argument('--api-cache-hours', type=float, default=24,
+                        help='Hours a cached Custom Search API result stays fresh (default: 24)')
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='Maximum concurrent requests (default: 4)')
+    parser.add_argument('--per-host', type=int, default=2, help='Maximum concurrent requests per host (default: 2)')
+    parser.add_argument('--min-interval', type=float, default=0.5,
+                        help='Shortest pause between requests to one host, in seconds (default: 0.5)')
+    parser.add_argument('--max-interval', type=float, default=60.0,
+                        help='Longest pause between requests to one host after errors, in seconds (default: 60)')
+    parser.add_argument('--retries', type=int, default=2,
+                        help='Retries for a failed request, with jittered backoff (default: 2)')
+    parser.add_argument('--crawl', type=int, default=0, metavar='PAGES',
+                        help='Also scan up to PAGES result pages per Google search for invites (default: 0, off)')
+    parser.add_argument('--crawl-depth', type=int, default=0,
+                        help='Follow same-site links this many levels below the result pages (default: 0)')
+    parser.add_argument('--crawl-per-domain', type=int, default=2,
+                        help='Pages of one domain fetched per crawl round (default: 2)')
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default=DEFAULT_BACKEND,
+                        help=f'HTML parser backend (default: {DEFAULT_BACKEND}); lxml and stream collect only '
+                             f'anchors, meta tags and text, html.parser builds the full tree')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='Processes that parse HTML in parallel (default: 0, parse in this process; -1: one per core)')
+    parser.add_argument('--no-prefilter', action='store_true',
+                        help='Always decode and parse pages instead of prefiltering the raw bytes')
+    parser.add_argument('--cache-file', default='http_cache.db', help='HTTP response cache file (default: http_cache.db)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not cache HTTP responses between runs')
+    parser.add_argument('--cache-max-mb', type=int, default=200, help='Maximum HTTP cache size in MB (default: 200)')
+    parser.add_argument('--serp-ttl', type=float, default=12, help='Hours a cached search page stays fresh (default: 12)')
+    parser.add_argument('--page-ttl', type=float, default=168, help='Hours a cached web page stays fresh (default: 168)')
+    parser.add_argument('--compact', action='store_true',
+                        help='Merge the link journal into a sorted output file and exit')
+    parser.add_argument('--no-compact', action='store_true',
+                        help='Leave new links in the journal at the end of the run instead of rewriting the output file')
+    parser.add_argument('--store', choices=LINK_STORES, default='text',
+                        help='Link store: text journal, or sqlite with provenance and first/last-seen times (default: text)')
+    parser.add_argument('--db-file', default='invite_links.db', help='SQLite link database (default: invite_links.db)')
+    parser.add_argument('--new-since', metavar='YYYY-MM-DD',
+                        help='List links first seen on or after a date from the link database and exit')
+    parser.add_argument('--from-site', metavar='SITE', help='List links found on a site (e.g. medium.com) and exit')
+    parser.add_argument('--from-keyword', metavar='KEYWORDS',
+                        help='List links found by a keyword query (e.g. "crypto blockchain") and exit')
+    parser.add_argument('--dedup-index', nargs='?', const='invite_index.db', default=None, metavar='FILE',
+                        help='Deduplicate through an on-disk index behind a Bloom filter instead of holding '
+                             'every link in memory (default file: invite_index.db)')
+    parser.add_argument('--dedup-memory-mb', type=float, default=16,
+                        help='Bloom filter size for --dedup-index in MB (default: 16)')
+    parser.add_argument('--merge', nargs='+', metavar='FILE',
+                        help='Merge other link files into the output and exit')
+    parser.add_argument('--schedule', choices=SCHEDULES, default='adaptive',
+                        help='Query order: adaptive (highest past yield first, with exploration) or fixed (default: adaptive)')
+    parser.add_argument('--query-stats', default='query_stats.db', help='Query yield statistics file (default: query_stats.db)')
+    parser.add_argument('--explore', type=float, default=0.2,
+                        help='Share of searches spent exploring lower-yield queries (default: 0.2)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the interrupted run from its checkpoint, skipping finished searches')
+    parser.add_argument('--checkpoint', default='run_checkpoint.jsonl',
+                        help='Run checkpoint file (default: run_checkpoint.jsonl)')
+    parser.add_argument('--coordinator', metavar='FILE',
+                        help='Run as one of several workers sharing the plan and links in FILE (SQLite)')
+    parser.add_argument('--worker-id', help='Name of this worker in the coordinator (default: host:pid)')
+    parser.add_argument('--stream', action='append', metavar='SINK',
+                        help='Stream each new link as it is found: jsonl:FILE, csv:FILE, stdout or stdout:jsonl '
+                             '(repeatable; with stdout, progress messages go to stderr)')
+    parser.add_argument('--stream-flush', type=float, default=1.0,
+                        help='Seconds a found link may wait before it is streamed (default: 1)')
+    parser.add_argument('--report', default='run_report.json', metavar='FILE',
+                        help='JSON run report with per-stage timings and counters (default: run_report.json)')
+    parser.add_argument('--no-report', action='store_true', help='Do not write a run report')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='Serve live metrics in Prometheus text format at http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Print the query plan and its estimated duration without searching')
+    parser.add_argument('--validate', action='store_true',
+                        help='Check every stored invite (valid / expired / unknown) and exit')
+    parser.add_argument('--validation-endpoint', default=DEFAULT_ENDPOINT,
+                        help='Invite lookup URL with a {code} placeholder (default: the Discord API)')
+    parser.add_argument('--validation-cache', default='invite_status.db',
+                        help='Validation result cache file (default: invite_status.db)')
+    parser.add_argument('--valid-output', metavar='FILE', help='With --validate, write the valid invites to FILE')
     
     args = parser.parse_args()
     
+    if args.new_since or args.from_site or args.from_keyword:
+        store = SQLiteLinkStore(args.db_file, export_file=args.output)
+        if args.new_since:
+            print_stored_links(store.new_since(datetime.strptime(args.new_since, '%Y-%m-%d').timestamp()))
+        if args.from_site:
+            print_stored_links(store.by_site(args.from_site))
+        if args.from_keyword:
+            print_stored_links(store.by_keyword(args.from_keyword))
+        store.close()
+        return
+    
+    sinks = []
+    if args.stream:
+        stdout = sys.stdout
+        if any(spec.partition(':')[0] == 'stdout' for spec in args.stream):
+            # Pipe mode: stdout carries only the streamed links
+            sys.stdout = sys.stderr
+        try:
+            sinks = [open_sink(spec, stdout) for spec in args.stream]
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+    
     # Check for API credentials in config file
     api_key = args.api_key
     search_engine_id = args.search_engine_id
@@ -389,10 +1154,69 @@ def main():
         output_file=args.output,
         use_google_api=args.use_api,
         api_key=api_key,
-        search_engine_id=search_engine_id
+        search_engine_id=search_engine_id,
+        max_concurrency=args.concurrency,
+        per_host_limit=args.per_host,
+        parser_backend=args.parser,
+        use_prefilter=not args.no_prefilter,
+        cache_file=None if args.no_cache else args.cache_file,
+        cache_max_mb=args.cache_max_mb,
+        cache_ttls={'serp': args.serp_ttl * 3600, 'page': args.page_ttl * 3600},
+        api_cache_hours=args.api_cache_hours,
+        api_results=args.api_results,
+        compact_on_finish=not args.no_compact,
+        link_store=args.store,
+        db_file=args.db_file,
+        dedup_index=args.dedup_index,
+        dedup_memory_mb=args.dedup_memory_mb,
+        schedule=args.schedule,
+        query_stats_file=args.query_stats,
+        explore_rate=args.explore,
+        checkpoint_file=args.checkpoint,
+        min_request_interval=args.min_interval,
+        max_request_interval=args.max_interval,
+        max_retries=args.retries,
+        crawl_pages=args.crawl,
+        crawl_depth=args.crawl_depth,
+        crawl_per_domain=args.crawl_per_domain,
+        parse_workers=args.parse_workers,
+        coordinator_file=args.coordinator,
+        worker_id=args.worker_id,
+        sinks=sinks,
+        sink_flush_seconds=args.stream_flush,
+        report_file=None if args.no_report else args.report,
+        metrics_port=args.metrics_port
     )
-    scraper.run(max_searches=args.max_searches)
+    # Every exit path, early returns included, flushes and closes the streamed outputs
+    try:
+        if args.dry_run:
+            for line in scraper.plan_queries(args.max_searches).describe(*scraper.plan_pace()):
+                print(line)
+            return
+        if args.validate:
+            scraper.validate_links(args.validation_endpoint, args.validation_cache, args.valid_output)
+            return
+        if args.merge:
+            merged = scraper.merge_link_files(args.merge)
+            if not args.no_compact:
+                scraper.compact_links()
+            print(f"Merged {merged} new links; {len(scraper.discord_links)} links in {args.output}")
+            if scraper.dedup_index is not None:
+                print(scraper.dedup_index.summary())
+            return
+        if args.compact:
+            scraper.compact_links()
+            print(f"Compacted {len(scraper.discord_links)} links into {args.output}")
+            return
+        scraper.serve_metrics()
+        scraper.run(max_searches=args.max_searches, resume=args.resume)
+    finally:
+        scraper.close_metrics()
+        if scraper.sinks:
+            scraper.sinks.close()
 
 if __name__ == "__main__":
+    # Parse worker processes re-enter here in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
 
@@ -5,6 +5,7 @@ User-friendly graphical interface for scraping Discord invite links
 
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
+import multiprocessing
 import threading
 import queue
 import sys
@@ -12,6 +13,8 @@ import os
 
 # Import the scraper class
 from discord_scraper import DiscordLinkScraper
+from page_parser import PARSER_BACKENDS, DEFAULT_BACKEND
+from link_store import LINK_STORES
 
 class DiscordScraperGUI:
     def __init__(self, root):
@@ -66,10 +69,50 @@ class DiscordScraperGUI:
         max_searches_spinbox = ttk.Spinbox(settings_frame, from_=1, to=1000, textvariable=self.max_searches_var, width=10)
         max_searches_spinbox.grid(row=1, column=1, sticky=tk.W, pady=(10, 0))
         
+        # Concurrent requests
+        ttk.Label(settings_frame, text="Concurrency:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        self.concurrency_var = tk.StringVar(value="4")
+        concurrency_spinbox = ttk.Spinbox(settings_frame, from_=1, to=64, textvariable=self.concurrency_var, width=10)
+        concurrency_spinbox.grid(row=2, column=1, sticky=tk.W, pady=(10, 0))
+        
+        # HTML parser backend
+        ttk.Label(settings_frame, text="HTML Parser:").grid(row=3, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        self.parser_var = tk.StringVar(value=DEFAULT_BACKEND)
+        parser_combo = ttk.Combobox(settings_frame, textvariable=self.parser_var, values=PARSER_BACKENDS,
+                                    state="readonly", width=12)
+        parser_combo.grid(row=3, column=1, sticky=tk.W, pady=(10, 0))
+        
         # Use Google API checkbox
         self.use_api_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(settings_frame, text="Use Google Custom Search API (100 free/day)", 
-                       variable=self.use_api_var).grid(row=2, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+                       variable=self.use_api_var).grid(row=4, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        
+        # Cache HTTP responses between runs
+        self.use_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(settings_frame, text="Cache pages between runs (revalidates stale pages)", 
+                       variable=self.use_cache_var).grid(row=5, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        
+        # Link store backend
+        ttk.Label(settings_frame, text="Link Store:").grid(row=6, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        self.link_store_var = tk.StringVar(value="text")
+        link_store_combo = ttk.Combobox(settings_frame, textvariable=self.link_store_var, values=LINK_STORES,
+                                        state="readonly", width=12)
+        link_store_combo.grid(row=6, column=1, sticky=tk.W, pady=(10, 0))
+        
+        # Bounded-memory dedup index
+        self.use_dedup_index_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="Low-memory dedup index (for very large link files)", 
+                       variable=self.use_dedup_index_var).grid(row=7, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        
+        # Adaptive query order
+        self.adaptive_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(settings_frame, text="Adaptive query order (search high-yield queries first)", 
+                       variable=self.adaptive_var).grid(row=8, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        
+        # Continue the last stopped or crashed run from its checkpoint
+        self.resume_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="Resume interrupted run (skip searches already done)", 
+                       variable=self.resume_var).grid(row=9, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
         
         # Keywords Frame
         keywords_frame = ttk.LabelFrame(main_frame, text="Keywords (Select keywords to search)", padding="10")
@@ -278,8 +321,19 @@ class DiscordScraperGUI:
         except:
             max_searches = 50
             messagebox.showerror("Invalid Input", "Max searches must be a number. Using default: 50")
+        try:
+            concurrency = int(self.concurrency_var.get())
+        except:
+            concurrency = 4
+            messagebox.showerror("Invalid Input", "Concurrency must be a number. Using default: 4")
         
         use_api = self.use_api_var.get()
+        parser_backend = self.parser_var.get()
+        cache_file = 'http_cache.db' if self.use_cache_var.get() else None
+        link_store = self.link_store_var.get()
+        dedup_index = 'invite_index.db' if self.use_dedup_index_var.get() else None
+        schedule = 'adaptive' if self.adaptive_var.get() else 'fixed'
+        resume = self.resume_var.get()
         
         # Get selected keywords and sites
         selected_keywords = self.get_selected_keywords()
@@ -320,7 +374,8 @@ class DiscordScraperGUI:
         # Start scraping in separate thread
         thread = threading.Thread(target=self.run_scraper, 
                                  args=(output_file, max_searches, use_api, api_key, search_engine_id, 
-                                      selected_keywords, selected_sites),
+                                      selected_keywords, selected_sites, concurrency, parser_backend, cache_file,
+                                      link_store, dedup_index, schedule, resume),
                                  daemon=True)
         thread.start()
         
@@ -328,7 +383,9 @@ class DiscordScraperGUI:
         self.update_progress("Scraping in progress...")
     
     def run_scraper(self, output_file, max_searches, use_api, api_key, search_engine_id, 
-                   selected_keywords, selected_sites):
+                   selected_keywords, selected_sites, concurrency=4, parser_backend=DEFAULT_BACKEND,
+                   cache_file='http_cache.db', link_store='text', dedup_index=None, schedule='adaptive',
+                   resume=False):
         """Run the scraper in a separate thread."""
         try:
             # Create scraper instance
@@ -338,7 +395,13 @@ class DiscordScraperGUI:
                 api_key=api_key,
                 search_engine_id=search_engine_id,
                 custom_keywords=selected_keywords,
-                custom_sites=selected_sites
+                custom_sites=selected_sites,
+                max_concurrency=concurrency,
+                parser_backend=parser_backend,
+                cache_file=cache_file,
+                link_store=link_store,
+                dedup_index=dedup_index,
+                schedule=schedule
             )
             
             initial_count = len(scraper.discord_links)
@@ -357,46 +420,42 @@ class DiscordScraperGUI:
             builtins.print = log_print
             
             # Run scraper
-            queries = scraper.generate_search_queries()
-            total_searches = min(len(queries), max_searches)
+            plan, searches = scraper.start_run(max_searches, resume)
+            total_searches = len(plan.searches)
             
-            self.output_queue.put(("log", f"Will perform {total_searches} searches"))
+            self.output_queue.put(("log", f"Will perform {len(searches)} searches ({plan.requests} Google requests planned)"))
             self.output_queue.put(("log", "=" * 60))
             
             new_links_count = 0
-            for i, (source_type, query) in enumerate(queries[:total_searches], 1):
+            completed = True
+            batch_size = scraper.fetch_engine.max_concurrency
+            for start in range(0, len(searches), batch_size):
                 if not self.is_running:
-                    self.output_queue.put(("log", "Scraping stopped by user"))
+                    self.output_queue.put(("log", "Scraping stopped by user (tick 'Resume interrupted run' to continue it)"))
+                    completed = False
                     break
                 
-                self.output_queue.put(("progress", f"[{i}/{total_searches}] Searching {source_type}: {query}"))
+                batch = searches[start:start + batch_size]
+                self.output_queue.put(("progress", f"[{batch[0].index + 1}-{batch[-1].index + 1}/{total_searches}] "
+                                                   f"Searching {len(batch)} queries"))
                 
                 try:
-                    if source_type == 'x.com':
-                        links = scraper.search_x_com_via_google(query)
-                    else:
-                        links = scraper.search_articles(query)
-                    
-                    new_links = links - scraper.discord_links
-                    scraper.discord_links.update(links)
-                    
+                    new_per_search = scraper.run_batch(batch)
+                except Exception as e:
+                    self.output_queue.put(("log", f"Error: {str(e)}"))
+                    completed = False
+                    continue
+                
+                for new_links in new_per_search:
                     if new_links:
                         new_links_count += len(new_links)
                         self.output_queue.put(("log", f"Found {len(new_links)} new links!"))
                         for link in new_links:
                             self.output_queue.put(("log", f"  - {link}"))
-                    
-                    # Save periodically
-                    if i % 10 == 0:
-                        scraper.save_links()
-                        self.output_queue.put(("log", f"Progress saved: {len(scraper.discord_links)} total links"))
-                        self.output_queue.put(("stats", len(scraper.discord_links)))
-                    
-                except Exception as e:
-                    self.output_queue.put(("log", f"Error: {str(e)}"))
+                self.output_queue.put(("stats", len(scraper.discord_links)))
             
-            # Final save
-            scraper.save_links()
+            # Final save; a stopped or partly failed run keeps its checkpoint
+            scraper.finish_run(completed)
             
             # Restore original print
             builtins.print = original_print
@@ -407,6 +466,8 @@ class DiscordScraperGUI:
             self.output_queue.put(("log", f"Scraping completed!"))
             self.output_queue.put(("log", f"Total unique Discord invite links: {final_count}"))
             self.output_queue.put(("log", f"New links found: {new_links_count}"))
+            for line in scraper.summary_lines():
+                self.output_queue.put(("log", line))
             self.output_queue.put(("log", f"Links saved to: {output_file}"))
             self.output_queue.put(("done", final_count))
             
@@ -463,5 +524,7 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # Parse worker processes re-enter here in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
 
@@ -0,0 +1,262 @@
+"""
+Concurrent fetch engine for the Discord scraper.
+Runs blocking HTTP calls on an asyncio event loop with a global concurrency limit
+and a per-host concurrency limit, so bulk page fetches and searches overlap
+instead of running strictly one at a time. An optional HTTPCache serves fresh
+responses from disk and revalidates stale ones with conditional requests, an
+optional RateController paces the requests sent to each host, and an optional
+RetryPolicy retries failed requests and stops calling hosts that keep failing.
+An optional RunMetrics records request latency, bytes and time spent pacing.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+
+class FetchResult:
+    """Outcome of a single fetch: the response fields we use, or the error raised."""
+
+    def __init__(self, url, status_code=None, content=b'', headers=None, encoding=None,
+                 error=None, elapsed=0.0, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.encoding = encoding
+        self.error = error
+        self.elapsed = elapsed
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return self.error is None and self.status_code == 200
+
+    @property
+    def text(self):
+        """Decode the body the same way requests would."""
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class AsyncFetchEngine:
+    def __init__(self, max_concurrency=4, per_host_limit=2, timeout=15, headers=None, cache=None,
+                 rate_controller=None, retry_policy=None, metrics=None):
+        """
+        Initialize the fetch engine.
+
+        max_concurrency bounds the number of requests in flight overall,
+        per_host_limit bounds the number in flight against any single host.
+        Requests borrow a requests.Session from a pool kept on the engine, so their
+        keep-alive connections are reused by every later batch until close().
+        cache is an optional http_cache.HTTPCache shared by every fetch.
+        rate_controller is an optional rate_controller.RateController; cached
+        responses do not wait for it. retry_policy is an optional
+        retry_policy.RetryPolicy; every attempt is paced by the rate controller.
+        metrics is an optional run_metrics.RunMetrics.
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self.timeout = timeout
+        self.headers = dict(DEFAULT_HEADERS)
+        if headers:
+            self.headers.update(headers)
+        self.cache = cache
+        self.rate_controller = rate_controller
+        self.retry_policy = retry_policy
+        self.metrics = metrics
+        # Worker threads beyond max_concurrency run calls whose threads are waiting out a
+        # pacing delay or retry backoff without a slot (see idle); threads start on demand
+        self.max_workers = self.max_concurrency * 8
+        self._executor = None
+        self._local = threading.local()
+        # Idle sessions; at most one per request in flight is ever created
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+    @contextmanager
+    def _session(self):
+        """Borrow a pooled requests.Session for one request."""
+        with self._sessions_lock:
+            session = self._sessions.pop() if self._sessions else None
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+        try:
+            yield session
+        finally:
+            with self._sessions_lock:
+                self._sessions.append(session)
+
+    def idle(self, seconds):
+        """
+        Sleep for seconds. On a worker thread the global slot is handed back while it
+        sleeps and taken again afterwards, so a host that is being paced or backed off
+        never keeps requests to other hosts waiting.
+        """
+        slot = getattr(self._local, 'slot', None)
+        if slot is None:
+            time.sleep(seconds)
+            return
+        loop, global_sem = slot
+        loop.call_soon_threadsafe(global_sem.release)
+        try:
+            time.sleep(seconds)
+        finally:
+            asyncio.run_coroutine_threadsafe(global_sem.acquire(), loop).result()
+
+    def _call_with_slot(self, slot, func, args):
+        """Run func(*args) on this worker thread, which holds slot (event loop, global semaphore)."""
+        self._local.slot = slot
+        try:
+            return func(*args)
+        finally:
+            self._local.slot = None
+
+    def _fetch_sync(self, url, headers=None, source='page'):
+        """
+        Perform one blocking GET and wrap the outcome in a FetchResult.
+        With a cache, fresh entries are returned without a request and stale
+        entries are revalidated with If-None-Match / If-Modified-Since.
+        """
+        cache = self.cache
+        cached = cache.get(url) if cache else None
+        if cached is not None and cache.is_fresh(cached, source):
+            cache.count('hits')
+            if self.metrics:
+                self.metrics.count(f'cache_hits_{source}')
+            return FetchResult(url, cached.status_code, cached.content, cached.headers,
+                               cached.encoding, from_cache=True)
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            request_headers.update(cached.validators())
+
+        rate = self.rate_controller
+        metrics = self.metrics
+        host = urlparse(url).netloc.lower()
+
+        def send():
+            if rate:
+                waited = time.monotonic()
+                rate.wait(host, sleep=self.idle)
+                if metrics:
+                    metrics.add_time('rate_wait', time.monotonic() - waited)
+            sent = time.monotonic()
+            try:
+                with self._session() as session:
+                    response = session.get(url, headers=request_headers, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                if metrics:
+                    metrics.add_time(f'fetch_{source}', time.monotonic() - sent)
+                    metrics.count('fetch_errors')
+                if rate:
+                    rate.observe(host, error=e)
+                raise
+            if metrics:
+                # Network time of this one attempt: pacing and retry backoff are timed apart
+                latency = time.monotonic() - sent
+                metrics.add_time(f'fetch_{source}', latency)
+                metrics.observe('fetch_seconds', latency)
+                metrics.count('fetch_bytes', len(response.content))
+                metrics.count(f'fetch_status_{response.status_code // 100}xx')
+            if rate:
+                rate.observe(host, response.status_code, response.headers)
+            return response
+
+        start = time.monotonic()
+        try:
+            response = self.retry_policy.call(host, send, sleep=self.idle) if self.retry_policy else send()
+        except requests.exceptions.RequestException as e:
+            if cache:
+                cache.count('misses')
+            return FetchResult(url, error=e, elapsed=time.monotonic() - start)
+        elapsed = time.monotonic() - start
+
+        if cached is not None and response.status_code == 304:
+            cache.refresh(url)
+            cache.count('revalidated')
+            return FetchResult(url, cached.status_code, cached.content, cached.headers,
+                               cached.encoding, elapsed=elapsed, from_cache=True)
+        if cache:
+            cache.count('misses')
+            if response.status_code == 200:
+                cache.store(url, response.status_code, response.content, response.headers, response.encoding)
+        return FetchResult(url, response.status_code, response.content, response.headers,
+                           response.encoding, elapsed=elapsed)
+
+    async def _run_limited(self, host, func, args, limits, executor):
+        """Run func(*args) in the thread pool once a host slot and a global slot are free."""
+        global_sem, host_sems = limits
+        if host not in host_sems:
+            host_sems[host] = asyncio.Semaphore(self.per_host_limit)
+        # Take the host slot first so a saturated host does not hold global slots; a
+        # worker waiting out pacing or backoff gives its global slot back (see idle)
+        async with host_sems[host]:
+            async with global_sem:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(executor, self._call_with_slot, (loop, global_sem), func, args)
+
+    async def run_all_async(self, calls, callback=None):
+        """
+        Run (host, func, args) calls concurrently under the configured limits.
+        Results are returned in input order; callback(index, result) fires as each one completes.
+        """
+        limits = (asyncio.Semaphore(self.max_concurrency), {})
+        # One pool for the engine's lifetime, so every batch reuses the worker
+        # threads' sessions and their open connections
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        executor = self._executor
+
+        async def run_one(index, host, func, args):
+            try:
+                result = await self._run_limited(host, func, args, limits, executor)
+            except Exception as e:
+                result = e
+            if callback:
+                callback(index, result)
+            return result
+
+        return await asyncio.gather(*(run_one(i, host, func, args)
+                                      for i, (host, func, args) in enumerate(calls)))
+
+    def run_all(self, calls, callback=None):
+        """Synchronous wrapper around run_all_async for callers without an event loop."""
+        if not calls:
+            return []
+        return asyncio.run(self.run_all_async(calls, callback))
+
+    def map(self, func, items, host):
+        """Call func(item) for every item concurrently, all counted against one host."""
+        return self.run_all([(host, func, (item,)) for item in items])
+
+    def fetch_all(self, urls, headers=None, callback=None, source='page'):
+        """
+        Fetch all URLs concurrently and return a FetchResult per URL, in input order.
+        source selects the cache freshness lifetime ('serp' or 'page').
+        """
+        calls = [(urlparse(url).netloc.lower(), self._fetch_sync, (url, headers, source)) for url in urls]
+        return self.run_all(calls, callback)
+
+    def fetch(self, url, headers=None, source='page'):
+        """Fetch a single URL through the engine."""
+        return self.fetch_all([url], headers, source=source)[0]
+
+    def close(self):
+        """Stop the worker threads and close the pooled sessions. A later fetch starts new ones."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
@@ -5,10 +5,149 @@ This is an alternative method using Google's official API.
 
 import requests
 import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from urllib.parse import quote_plus
 
+from retry_policy import reached_server
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+except Exception:
+    # No tz database available: Pacific Standard Time is close enough for a day key
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+# Matches a quoted phrase or a single bare term in a search query
+QUERY_TERM_PATTERN = re.compile(r'"[^"]*"|\S+')
+
+
+def normalize_query(query):
+    """
+    Normalize a query so equivalent spellings share one cache entry:
+    lowercase, whitespace collapsed, terms in a fixed order (quoted phrases kept whole).
+    """
+    return ' '.join(sorted(QUERY_TERM_PATTERN.findall(query.lower())))
+
+
+class QueryResultCache:
+    def __init__(self, path='search_api_cache.db', max_age=24 * 3600):
+        """
+        Persistent cache of normalized query -> Custom Search result items.
+        Entries younger than max_age seconds are fresh; older entries are kept
+        so they can still be served once the daily quota runs out.
+        """
+        self.path = path
+        self.max_age = max_age
+        self.stats = {'fresh_hits': 0, 'stale_hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                query_key TEXT NOT NULL,
+                start INTEGER NOT NULL,
+                num INTEGER NOT NULL,
+                query TEXT NOT NULL,
+                items TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (query_key, start, num)
+            )''')
+        self._conn.commit()
+
+    def get(self, query, num, start=1):
+        """Return (items, is_fresh) for a result page, or (None, False) if it was never cached."""
+        with self._lock:
+            row = self._conn.execute('SELECT items, fetched_at FROM results '
+                                     'WHERE query_key = ? AND start = ? AND num = ?',
+                                     (normalize_query(query), start, num)).fetchone()
+        if row is None:
+            return None, False
+        items, fetched_at = row
+        return json.loads(items), time.time() - fetched_at < self.max_age
+
+    def put(self, query, num, items, start=1):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO results (query_key, start, num, query, items, fetched_at) '
+                               'VALUES (?, ?, ?, ?, ?, ?)',
+                               (normalize_query(query), start, num, query, json.dumps(items), time.time()))
+            self._conn.commit()
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def summary(self):
+        s = self.stats
+        return (f"Search API cache: {s['fresh_hits']} fresh hits, {s['stale_hits']} stale hits served, "
+                f"{s['misses']} API calls")
+
+
+class QuotaLedger:
+    def __init__(self, path='search_api_quota.db', daily_quota=100):
+        """
+        Persistent per-day count of Custom Search API calls.
+        Days follow Pacific time, when Google resets the quota. Every update runs
+        in an IMMEDIATE transaction, so several processes can share the file safely.
+        """
+        self.path = path
+        self.daily_quota = daily_quota
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS usage (day TEXT PRIMARY KEY, used INTEGER NOT NULL)')
+
+    def today(self):
+        return datetime.now(QUOTA_TIMEZONE).strftime('%Y-%m-%d')
+
+    def next_reset(self):
+        """When today's quota resets, as an aware datetime."""
+        now = datetime.now(QUOTA_TIMEZONE)
+        return (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def used(self):
+        with self._lock:
+            row = self._conn.execute('SELECT used FROM usage WHERE day = ?', (self.today(),)).fetchone()
+        return row[0] if row else 0
+
+    def remaining(self):
+        return max(0, self.daily_quota - self.used())
+
+    def try_consume(self, calls=1):
+        """Reserve calls from today's quota. Returns False (and reserves nothing) if too few are left."""
+        day = self.today()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute('SELECT used FROM usage WHERE day = ?', (day,)).fetchone()
+                used = row[0] if row else 0
+                if used + calls > self.daily_quota:
+                    self._conn.execute('ROLLBACK')
+                    return False
+                self._conn.execute('INSERT OR REPLACE INTO usage (day, used) VALUES (?, ?)', (day, used + calls))
+                self._conn.execute('COMMIT')
+                return True
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def refund(self, calls=1):
+        """Give back calls reserved by try_consume() that were never sent."""
+        with self._lock:
+            self._conn.execute('UPDATE usage SET used = MAX(0, used - ?) WHERE day = ?', (calls, self.today()))
+
+    def mark_exhausted(self):
+        """Record that the API refused a call: nothing is left for today."""
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO usage (day, used) VALUES (?, ?)',
+                               (self.today(), self.daily_quota))
+
+
 class GoogleCustomSearchAPI:
-    def __init__(self, api_key=None, search_engine_id=None):
+    def __init__(self, api_key=None, search_engine_id=None, cache=None, ledger=None, retry_policy=None,
+                 rate_controller=None, sleep=time.sleep):
         """
         Initialize Google Custom Search API.
         
@@ -22,22 +161,99 @@ class GoogleCustomSearchAPI:
         self.search_engine_id = search_engine_id
         self.base_url = "https://www.googleapis.com/customsearch/v1"
         self.daily_quota = 100  # Free tier limit
+        # Pooled keep-alive connections; Google only compresses responses for
+        # clients that send Accept-Encoding: gzip and mention gzip in the User-Agent
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=16))
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip',
+            'User-Agent': 'discord-scraper/1.0 (gzip)',
+        })
+        # Optional QueryResultCache; repeated queries cost no API calls
+        self.cache = cache
+        # Optional QuotaLedger; calls are refused locally once today's quota is spent
+        self.ledger = ledger
+        self.quota_exhausted = False
+        # Optional retry_policy.RetryPolicy. Every call is billed, so a call is only
+        # repeated when it never reached Google or was throttled (429)
+        self.retry_policy = retry_policy
+        # Optional rate_controller.RateController; per-minute throttling (429) slows
+        # the calls down instead of ending the day's API use
+        self.rate_controller = rate_controller
+        # Waits out pacing and backoff; the scraper passes its fetch engine's idle(),
+        # so a paced API call does not hold a fetch slot
+        self.sleep = sleep
         
-    def search(self, query, num_results=10):
-        """Search using Google Custom Search API."""
+    def _is_daily_quota_error(self, response):
+        """
+        True if the API refused the call because today's quota is used up. A 429
+        without it is a short per-minute throttle that passes on its own.
+        """
+        if response.status_code not in (403, 429):
+            return False
+        text = response.text
+        return 'dailyLimitExceeded' in text or 'per day' in text.lower()
+    
+    def search(self, query, num_results=10, start=1):
+        """Search using Google Custom Search API. Returns one page of up to 10 results beginning at start."""
         if not self.api_key or not self.search_engine_id:
             print("Google Custom Search API not configured. Using free scraping method instead.")
             return []
         
+        num = min(num_results, 10)  # API limit is 10 per request
+        cached_items, is_fresh = self.cache.get(query, num, start) if self.cache else (None, False)
+        if cached_items is not None and is_fresh:
+            self.cache.count('fresh_hits')
+            return cached_items
+        
+        if self.quota_exhausted:
+            return self._serve_stale(query, cached_items)
+        
         try:
             params = {
                 'key': self.api_key,
                 'cx': self.search_engine_id,
                 'q': query,
-                'num': min(num_results, 10)  # API limit is 10 per request
+                'num': num,
+                'start': start,
+                # Only the fields the extractor reads, without pretty-printing
+                'fields': 'items(title,link,snippet)',
+                'prettyPrint': 'false',
             }
             
-            response = requests.get(self.base_url, params=params, timeout=10)
+            if self.ledger and not self.ledger.try_consume():
+                print("Daily API quota used up (ledger)")
+                self.quota_exhausted = True
+                return self._serve_stale(query, cached_items)
+            if self.cache:
+                self.cache.count('misses')
+            host = 'www.googleapis.com'
+            rate = self.rate_controller
+            
+            def send():
+                if rate:
+                    rate.wait(host, sleep=self.sleep)
+                try:
+                    response = self.session.get(self.base_url, params=params, timeout=10)
+                except requests.exceptions.RequestException as e:
+                    if rate:
+                        rate.observe(host, error=e)
+                    raise
+                if rate:
+                    rate.observe(host, response.status_code, response.headers)
+                return response
+            
+            try:
+                if self.retry_policy:
+                    response = self.retry_policy.call(host, send, idempotent=False, sleep=self.sleep)
+                else:
+                    response = send()
+            except requests.exceptions.RequestException as e:
+                # Refused by an open circuit or no connection made: nothing reached
+                # Google, so nothing was billed
+                if self.ledger and not reached_server(e):
+                    self.ledger.refund()
+                raise
             
             if response.status_code == 200:
                 data = response.json()
@@ -51,14 +267,100 @@ class GoogleCustomSearchAPI:
                             'snippet': item.get('snippet', '')
                         })
                 
+                if self.cache:
+                    self.cache.put(query, num, results, start)
                 return results
+            elif self._is_daily_quota_error(response):
+                print(f"API quota exhausted ({response.status_code})")
+                self.quota_exhausted = True
+                if self.ledger:
+                    self.ledger.mark_exhausted()
+                return self._serve_stale(query, cached_items)
             else:
                 print(f"API Error: {response.status_code} - {response.text}")
-                return []
+                raise requests.exceptions.HTTPError(f"API returned {response.status_code}", response=response)
         
-        except Exception as e:
+        except requests.exceptions.RequestException as e:
+            # Not an empty result: serve what the cache has, or let the caller fall back
             print(f"Error using Google Custom Search API: {str(e)}")
+            if cached_items is not None:
+                return self._serve_stale(query, cached_items)
+            raise
+    
+    def _serve_stale(self, query, cached_items):
+        """Return stale cached items once the quota is gone, or [] if the query was never cached."""
+        if cached_items is None:
             return []
+        self.cache.count('stale_hits')
+        print(f"Serving cached API results for: {query}")
+        return cached_items
+    
+    def search_batch(self, query, max_results=100):
+        """
+        Page through up to max_results results (the API stops at 100), yielding
+        each page's items as soon as it arrives. Every page is one API call.
+        """
+        max_results = min(max_results, 100)
+        for start in range(1, max_results + 1, 10):
+            num = min(10, max_results - start + 1)
+            items = self.search(query, num, start)
+            if items:
+                yield items
+            # A short page is the last one; stop paying for empty pages
+            if len(items) < num or self.quota_exhausted:
+                break
+    
+    def is_cached(self, query, num_results=10):
+        """True if fresh cached results would answer this query without an API call."""
+        if not self.cache:
+            return False
+        num_results = min(num_results, 100)
+        for start in range(1, num_results + 1, 10):
+            items, is_fresh = self.cache.get(query, min(10, num_results - start + 1), start)
+            if items is None or not is_fresh:
+                return False
+            if len(items) < min(10, num_results - start + 1):
+                break
+        return True
+    
+    def plan(self, queries, value=None, num_results=10):
+        """
+        Decide which queries get API calls under the remaining daily quota.
+
+        queries are in run order; value(query) scores a query (higher first), such as
+        its expected new links per request; without it the quota goes to queries in run
+        order. Fresh cached queries cost nothing.
+        num_results above 10 means paged batch searches, one call per page.
+        Returns a dict with the queries to send to the API ('api'), those answered
+        by the cache ('cached'), those left to HTML scraping ('fallback'), the
+        remaining quota, and the position in run order where the quota runs out.
+        """
+        if value is None:
+            value = lambda q: 0
+        remaining = self.ledger.remaining() if self.ledger else self.daily_quota
+        
+        cached = [q for q in queries if self.is_cached(q, num_results)]
+        cached_set = set(cached)
+        uncached = [q for q in queries if q not in cached_set]
+        # Stable sort: equal-value queries keep run order. Paged queries cost one call per page
+        ranked = sorted(uncached, key=value, reverse=True)
+        calls_per_query = (min(num_results, 100) + 9) // 10
+        api = set(ranked[:remaining // calls_per_query])
+        fallback = [q for q in uncached if q not in api]
+        
+        exhausted_at = None
+        if fallback and not api:
+            exhausted_at = 0
+        elif fallback:
+            calls = 0
+            for position, query in enumerate(queries, 1):
+                if query in api:
+                    calls += 1
+                    if calls == len(api):
+                        exhausted_at = position
+                        break
+        return {'api': api, 'cached': cached, 'fallback': fallback, 'remaining': remaining,
+                'calls': len(api) * calls_per_query, 'exhausted_at': exhausted_at}
     
     def is_available(self):
         """Check if API is configured."""
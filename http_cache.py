@@ -0,0 +1,158 @@
+"""
+Persistent on-disk HTTP response cache for the fetch engine.
+Responses are kept in a SQLite file with per-source freshness (TTL),
+ETag/Last-Modified revalidation once an entry goes stale, and
+least-recently-used eviction once the cache grows past its size limit.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+# Seconds a cached response is served without asking the server again
+DEFAULT_TTLS = {
+    'serp': 12 * 3600,      # Google result pages
+    'page': 7 * 24 * 3600,  # article and post pages
+    'robots': 24 * 3600,    # robots.txt, re-read daily as RFC 9309 suggests
+}
+
+# Response headers kept with each entry
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Date')
+
+
+class CachedResponse:
+    """A response read back from the cache."""
+
+    def __init__(self, url, status_code, content, headers, encoding, fetched_at):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding
+        self.fetched_at = fetched_at
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+    def validators(self):
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.headers.get('ETag'):
+            headers['If-None-Match'] = self.headers['ETag']
+        if self.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = self.headers['Last-Modified']
+        return headers
+
+
+class HTTPCache:
+    def __init__(self, path='http_cache.db', max_bytes=200 * 1024 * 1024, ttls=None):
+        """
+        Open (or create) the cache file at path.
+
+        max_bytes bounds the total size of stored bodies; ttls maps a source
+        name ('serp', 'page', ...) to its freshness lifetime in seconds.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        # One connection shared by the fetch worker threads, guarded by _lock;
+        # SQLite's own locking keeps concurrent runs from corrupting the file
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                encoding TEXT,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self._conn.commit()
+        self._total_bytes = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def ttl_for(self, source):
+        return self.ttls.get(source, self.ttls['page'])
+
+    def get(self, url):
+        """Return the CachedResponse for url, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, headers, encoding, body, fetched_at FROM responses WHERE url = ?',
+                (url,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE url = ?', (time.time(), url))
+            self._conn.commit()
+        status, headers, encoding, body, fetched_at = row
+        return CachedResponse(url, status, zlib.decompress(body), json.loads(headers), encoding, fetched_at)
+
+    def has_fresh(self, url, source):
+        """True if a fresh entry for url would be served without a request."""
+        with self._lock:
+            row = self._conn.execute('SELECT fetched_at FROM responses WHERE url = ?', (url,)).fetchone()
+        return row is not None and time.time() - row[0] < self.ttl_for(source)
+
+    def is_fresh(self, entry, source):
+        return entry.age() < self.ttl_for(source)
+
+    def store(self, url, status_code, content, headers, encoding):
+        """Store a response, then evict least-recently-used entries if over the size limit."""
+        kept = {name: headers[name] for name in STORED_HEADERS if headers.get(name)}
+        body = zlib.compress(content)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (url, status, headers, encoding, body, size, fetched_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, status_code, json.dumps(kept), encoding, body, len(body), now, now))
+            self.stats['stores'] += 1
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def refresh(self, url):
+        """Mark an entry as freshly validated after a 304 Not Modified."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('UPDATE responses SET fetched_at = ?, last_access = ? WHERE url = ?', (now, now, url))
+            self._conn.commit()
+
+    def _evict(self):
+        """Delete least-recently-used entries until the total size fits. Caller holds _lock."""
+        # Other processes may share the file, so start from the real total
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        for url, size in self._conn.execute('SELECT url, size FROM responses ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM responses WHERE url = ?', (url,))
+            total -= size
+            self.stats['evictions'] += 1
+        self._total_bytes = total
+
+    def count(self, name):
+        """Thread-safe increment of a stats counter."""
+        with self._lock:
+            self.stats[name] += 1
+
+    def summary(self):
+        s = self.stats
+        lookups = s['hits'] + s['revalidated'] + s['misses']
+        hit_rate = (s['hits'] + s['revalidated']) / lookups * 100 if lookups else 0.0
+        return (f"HTTP cache: {s['hits']} hits, {s['revalidated']} revalidated (304), {s['misses']} misses "
+                f"({hit_rate:.0f}% served from cache), {s['evictions']} evicted")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,93 @@
+"""
+Discord invite extraction engine.
+One precompiled pattern covers every invite form we collect
+(discord.gg/, discord.com/invite/, discordapp.com/invite/, with or without a scheme),
+scans each input once and returns canonical invite codes.
+"""
+
+import re
+
+# Lowercase host forms; the input is lowercased before scanning so this stays a
+# case-sensitive pattern with a literal 'discord' prefix, which the regex engine
+# can skip to directly instead of trying a case-insensitive match at every offset.
+INVITE_PATTERN = re.compile(r'discord(?:app)?\.(?:gg|com/invite)/([a-z0-9-]+)')
+
+# Scanner for non-ASCII input, whose lowercase form may not line up with the original
+# (U+212A KELVIN SIGN lowercases to an ASCII 'k'), and for text dense with invites
+# (link files); only the host is case-insensitive
+INVITE_PATTERN_ANY_CASE = re.compile(r'(?i:discord(?:app)?\.(?:gg|com/invite)/)([a-zA-Z0-9-]+)')
+
+CANONICAL_PREFIX = 'https://discord.gg/'
+
+
+def extract_invite_codes(text):
+    """Return the set of invite codes found in text. Codes keep their original case."""
+    if not text:
+        return set()
+    if not text.isascii():
+        return set(INVITE_PATTERN_ANY_CASE.findall(text))
+    # Match on the lowercased copy, slice the code out of the original text
+    return {text[m.start(1):m.end(1)] for m in INVITE_PATTERN.finditer(text.lower())}
+
+
+def find_invite_codes(text):
+    """
+    Return every invite code in text, in order and with repeats. Meant for text that
+    is mostly invites, such as a link file, where one findall beats per-match slicing.
+    """
+    return INVITE_PATTERN_ANY_CASE.findall(text) if text else []
+
+
+def invite_url(code):
+    """Build the canonical invite URL for a code."""
+    return CANONICAL_PREFIX + code
+
+
+def invite_code(link):
+    """Return the invite code in a link, or None if it is not an invite link."""
+    match = INVITE_PATTERN_ANY_CASE.search(link)
+    return match.group(1) if match else None
+
+
+def extract_invite_links(text):
+    """Return the set of canonical invite URLs found in text."""
+    return {CANONICAL_PREFIX + code for code in extract_invite_codes(text)}
+
+
+# Raw-bytes prefilter. Patterns run on the lowercased response body, before any
+# charset detection or parsing.
+RAW_MARKER_PATTERN = re.compile(rb'discord(?:app)?\.(?:gg|com(?:/|%2f)invite)')
+RAW_INVITE_PATTERN = re.compile(rb'discord(?:app)?\.(?:gg|com/invite)/([a-z0-9-]+)')
+
+# A marker whose code is hidden by markup, an entity or percent-encoding, and only
+# a full parse can recover: <em>discord.gg/</em>code, discord.gg%2Fcode (/url?q= targets).
+# Empty codes such as the query echo "discord.gg/" or discord.gg%2F%22 are not hidden.
+# A code directly followed by a tag or an entity may continue after it in the parsed
+# text (discord.gg/ab<wbr>cd, discord.gg/ab&#45;c), so its raw match cannot be trusted.
+RAW_HIDDEN_PATTERN = re.compile(
+    rb'discord(?:app)?\.(?:gg|com(?:/|%2f)invite)'
+    rb'(?:(?:/|%2f)?(?:<|&(?!quot;|#39;))'
+    rb'|(?:/|%2f)%(?!2[0267])'
+    rb'|%2f[a-z0-9]'
+    rb'|/[a-z0-9-]+(?:<|&(?!quot;|#39;)))'
+)
+
+# Byte order marks of encodings the ASCII patterns cannot scan
+_UNSCANNABLE_BOMS = (b'\xff\xfe', b'\xfe\xff')
+
+
+def prefilter_raw(raw):
+    """
+    Scan raw response bytes for invites without decoding or parsing them.
+
+    Returns (codes, needs_parse): the invite codes written out literally in the
+    bytes, and whether some invite marker is hidden in markup and needs a full
+    parse. A document with no markers at all returns (set(), False).
+    """
+    if raw.startswith(_UNSCANNABLE_BOMS):
+        return set(), True
+    lowered = raw.lower()
+    if not RAW_MARKER_PATTERN.search(lowered):
+        return set(), False
+    codes = {raw[m.start(1):m.end(1)].decode('ascii') for m in RAW_INVITE_PATTERN.finditer(lowered)}
+    return codes, RAW_HIDDEN_PATTERN.search(lowered) is not None
@@ -0,0 +1,224 @@
+"""
+Bounded-memory dedup index for very large link corpora.
+An in-memory Bloom filter of a fixed size answers most "is this new" questions
+on its own (a miss means the invite is definitely new); the rest are settled
+exactly by an on-disk SQLite index of invite codes. Resident memory stays at
+the filter size plus one write batch, however many links the corpus holds.
+The index mirrors a link store and is rebuilt when the store changes outside it.
+"""
+
+import hashlib
+import math
+import sqlite3
+
+from invite_extractor import invite_url
+from invite_set import to_code
+
+
+class BloomFilter:
+    def __init__(self, size_bytes, hash_count, bits=None):
+        """size_bytes of bit array probed hash_count times per key (double hashing on one blake2b digest)."""
+        self.size_bits = size_bytes * 8
+        self.hash_count = hash_count
+        self.bits = bytearray(bits) if bits is not None else bytearray(size_bytes)
+
+    @classmethod
+    def for_capacity(cls, size_bytes, capacity):
+        """Choose the hash count that minimizes false positives at capacity items."""
+        hash_count = round(size_bytes * 8 / max(capacity, 1) * math.log(2))
+        return cls(size_bytes, max(1, min(hash_count, 16)))
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hash_count)]
+
+    def add(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] >> (position & 7) & 1 for position in self._positions(key))
+
+    def expected_fp_rate(self, items):
+        """False-positive probability once items keys have been added."""
+        return (1 - math.exp(-self.hash_count * items / self.size_bits)) ** self.hash_count
+
+
+class InviteIndex:
+    # Codes held in memory before they are written to the index file
+    BATCH_SIZE = 10000
+
+    def __init__(self, path='invite_index.db', memory_bytes=16 * 1024 * 1024):
+        """
+        Open (or create) the index at path. memory_bytes is the Bloom filter size;
+        the filter is saved in the index file and reloaded if it still matches.
+        """
+        self.path = path
+        self.memory_bytes = memory_bytes
+        self.stats = {'lookups': 0, 'filter_misses': 0, 'disk_lookups': 0, 'false_positives': 0}
+        self._pending = set()
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Keep SQLite's page cache small; the filter is the memory budget
+        self._conn.execute('PRAGMA cache_size=-2048')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS codes (code TEXT PRIMARY KEY) WITHOUT ROWID')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)')
+        self._conn.commit()
+        self._count = self._conn.execute('SELECT COUNT(*) FROM codes').fetchone()[0]
+        self.bloom = self._load_filter()
+
+    def _meta(self, key):
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, values):
+        self._conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', values.items())
+
+    def _load_filter(self):
+        """Reload the saved filter if it covers exactly the stored codes, otherwise rebuild it."""
+        bits = self._meta('bloom_bits')
+        self._capacity = self._meta('bloom_capacity') or 0
+        if (bits is not None and len(bits) == self.memory_bytes and self._meta('bloom_count') == self._count
+                and self._count <= self._capacity):
+            return BloomFilter(self.memory_bytes, self._meta('bloom_hashes'), bits)
+        return self._build_filter()
+
+    def _build_filter(self):
+        # Room to grow to twice the current size before add_code() rebuilds the filter
+        self._capacity = max(self._count * 2, 100000)
+        bloom = BloomFilter.for_capacity(self.memory_bytes, self._capacity)
+        for (code,) in self._conn.execute('SELECT code FROM codes'):
+            bloom.add(code.encode('ascii'))
+        return bloom
+
+    def sync(self, codes, signature):
+        """
+        Make the index mirror a link store. signature identifies the store's state
+        (see the stores' signature()); if it matches the last synced state nothing is
+        read, otherwise the index is rebuilt from codes. Returns True if it rebuilt.
+        """
+        if self._meta('signature') == signature:
+            return False
+        self._pending = set()
+        with self._conn:
+            self._conn.execute('DELETE FROM codes')
+            batch = []
+            for code in codes:
+                batch.append((code,))
+                if len(batch) >= 50000:
+                    self._conn.executemany('INSERT OR IGNORE INTO codes (code) VALUES (?)', batch)
+                    batch = []
+            self._conn.executemany('INSERT OR IGNORE INTO codes (code) VALUES (?)', batch)
+        self._count = self._conn.execute('SELECT COUNT(*) FROM codes').fetchone()[0]
+        self.bloom = self._build_filter()
+        self.mark_synced(signature)
+        return True
+
+    def mark_synced(self, signature):
+        """Record that the index matches the store in state signature and save the filter."""
+        self.flush()
+        with self._conn:
+            self._set_meta({'signature': signature, 'bloom_bits': bytes(self.bloom.bits),
+                            'bloom_hashes': self.bloom.hash_count, 'bloom_count': self._count,
+                            'bloom_capacity': self._capacity})
+
+    def flush(self):
+        """Write the pending codes to the index file."""
+        if self._pending:
+            with self._conn:
+                self._conn.executemany('INSERT OR IGNORE INTO codes (code) VALUES (?)',
+                                       ((code,) for code in self._pending))
+            self._pending = set()
+
+    def has_code(self, code):
+        self.stats['lookups'] += 1
+        key = code.encode('ascii')
+        if key not in self.bloom:
+            self.stats['filter_misses'] += 1
+            return False
+        if code in self._pending:
+            return True
+        self.stats['disk_lookups'] += 1
+        if self._conn.execute('SELECT 1 FROM codes WHERE code = ?', (code,)).fetchone():
+            return True
+        self.stats['false_positives'] += 1
+        return False
+
+    def __contains__(self, link):
+        code = to_code(link)
+        return code is not None and self.has_code(code)
+
+    def __len__(self):
+        return self._count
+
+    def add_code(self, code):
+        """Add a canonical code. Returns True if it was not in the index yet."""
+        if self.has_code(code):
+            return False
+        self.bloom.add(code.encode('ascii'))
+        self._pending.add(code)
+        self._count += 1
+        if len(self._pending) >= self.BATCH_SIZE:
+            self.flush()
+        if self._count > self._capacity:
+            self._grow_filter()
+        return True
+
+    def _grow_filter(self):
+        """
+        Rebuild the filter from the index for twice the codes it now holds. Its size stays
+        memory_bytes; only the hash count is retuned, so the false-positive rate rises as
+        the corpus outgrows the memory budget.
+        """
+        self.flush()
+        self.bloom = self._build_filter()
+        rate = self.bloom.expected_fp_rate(self._count)
+        print(f"Dedup index: filter rebuilt for {self._capacity} links ({self.bloom.hash_count} hashes, "
+              f"expected false positives {rate * 100:.2f}%)")
+        if rate > 0.05:
+            print(f"Dedup index: the {self.memory_bytes / 1024 / 1024:.1f} MiB filter is too small for "
+                  f"{self._count} links; raise --dedup-memory-mb to keep lookups off the disk")
+
+    def add(self, link):
+        """Add a link in any form. Returns True if its invite was not in the index yet."""
+        code = to_code(link)
+        return code is not None and self.add_code(code)
+
+    def update(self, links):
+        for link in links:
+            self.add(link)
+
+    def compact(self):
+        self.flush()
+
+    def codes(self):
+        """Iterate over every code in sorted order, streamed from disk."""
+        self.flush()
+        return (code for (code,) in self._conn.execute('SELECT code FROM codes ORDER BY code'))
+
+    def urls(self):
+        return (invite_url(code) for code in self.codes())
+
+    def __iter__(self):
+        return self.urls()
+
+    def false_positive_rate(self):
+        """Share of lookups for absent invites that the filter let through to disk."""
+        s = self.stats
+        absent = s['filter_misses'] + s['false_positives']
+        return s['false_positives'] / absent if absent else 0.0
+
+    def summary(self):
+        s = self.stats
+        return (f"Dedup index: {self._count} links, {self.memory_bytes / 1024 / 1024:.1f} MiB filter "
+                f"({self.bloom.hash_count} hashes), {s['lookups']} lookups, {s['disk_lookups']} read from disk, "
+                f"false positives {self.false_positive_rate() * 100:.2f}% "
+                f"(expected {self.bloom.expected_fp_rate(self._count) * 100:.2f}%)")
+
+    def close(self):
+        self.flush()
+        self._conn.close()
@@ -0,0 +1,136 @@
+"""
+Compact in-memory set of Discord invites.
+Invites are held as canonical invite codes, not URLs: the bulk of them in one
+sorted, newline-separated ASCII buffer, and codes added since the last
+compaction in a small regular set. A sparse index of every BLOCK-th code
+narrows a lookup to one block of the buffer, which a single find() scans
+(about two bytes of overhead per code, buffer separators and index together). Every link form (discord.gg/,
+discord.com/invite/, discordapp.com/invite/, bare codes) normalizes to the same
+code, and the https://discord.gg/ URL is only built when links are exported.
+"""
+
+import re
+from bisect import bisect_right
+from heapq import merge
+from itertools import accumulate, islice
+
+from invite_extractor import find_invite_codes, invite_code, invite_url
+
+BARE_CODE_PATTERN = re.compile(r'[A-Za-z0-9-]+')
+
+
+def to_code(value):
+    """Return the invite code of a link or bare code, or None if value is neither."""
+    code = invite_code(value)
+    if code:
+        return code
+    value = value.strip()
+    return value if BARE_CODE_PATTERN.fullmatch(value) else None
+
+
+class InviteSet:
+    # Codes added since the last compaction are folded into the buffer past this many
+    MAX_PENDING = 100000
+    # Codes per block of the sparse index
+    BLOCK = 64
+
+    def __init__(self, links=()):
+        """Build a set from links in any form; values that are not invites are ignored."""
+        # b'\n' + code + b'\n' + code + ... + b'\n', sorted; empty when there are no codes
+        self._blob = b''
+        self._count = 0
+        # First code of every block, and the offset of the newline before it
+        self._index = []
+        self._offsets = []
+        self._pending = set()
+        self.update(links)
+
+    @classmethod
+    def from_codes(cls, codes):
+        """Build a set straight from canonical codes (no normalization)."""
+        invites = cls()
+        # dict.fromkeys drops repeats but keeps input order, so input that is already
+        # sorted (a compacted link file, an indexed query) sorts in linear time
+        invites._load_sorted(sorted(dict.fromkeys(codes)))
+        return invites
+
+    @classmethod
+    def from_text(cls, text):
+        """Build a set from every invite in a block of text, e.g. a whole link file."""
+        return cls.from_codes(find_invite_codes(text))
+
+    def _load_sorted(self, codes):
+        """Replace the buffer with a sorted list of unique codes."""
+        self._blob = ('\n' + '\n'.join(codes) + '\n').encode('ascii') if codes else b''
+        self._count = len(codes)
+        block = self.BLOCK
+        self._index = codes[::block]
+        # Codes are ASCII: the newline before code i sits after the characters of the
+        # codes before it plus their i separators
+        chars_before = islice(accumulate(map(len, codes), initial=0), 0, len(codes), block)
+        self._offsets = [chars + i for i, chars in zip(range(0, len(codes), block), chars_before)]
+
+    def _buffer_codes(self):
+        """The codes in the buffer, in sorted order."""
+        if not self._blob:
+            return []
+        return self._blob[1:-1].decode('ascii').split('\n')
+
+    def _in_buffer(self, code):
+        """Bisect the sparse index for the block that would hold code, then scan that block."""
+        block = bisect_right(self._index, code) - 1
+        if block < 0:
+            return False
+        offsets = self._offsets
+        # The block runs from the newline before its first code to the one after its last
+        end = offsets[block + 1] + 1 if block + 1 < len(offsets) else len(self._blob)
+        return self._blob.find(b'\n' + code.encode('ascii') + b'\n', offsets[block], end) != -1
+
+    def has_code(self, code):
+        return code in self._pending or self._in_buffer(code)
+
+    def __contains__(self, link):
+        code = to_code(link)
+        return code is not None and self.has_code(code)
+
+    def __len__(self):
+        return self._count + len(self._pending)
+
+    def add_code(self, code):
+        """Add a canonical code. Returns True if it was not in the set yet."""
+        if self.has_code(code):
+            return False
+        self._pending.add(code)
+        if len(self._pending) >= self.MAX_PENDING:
+            self.compact()
+        return True
+
+    def add(self, link):
+        """Add a link in any form. Returns True if its invite was not in the set yet."""
+        code = to_code(link)
+        return code is not None and self.add_code(code)
+
+    def update(self, links):
+        for link in links:
+            self.add(link)
+
+    def compact(self):
+        """Fold the pending codes into the sorted buffer."""
+        if self._pending:
+            self._load_sorted(list(merge(self._buffer_codes(), sorted(self._pending))))
+            self._pending = set()
+
+    def codes(self):
+        """Iterate over every code in sorted order."""
+        return merge(self._buffer_codes(), sorted(self._pending))
+
+    def urls(self):
+        """Iterate over every invite as a canonical URL, sorted."""
+        return (invite_url(code) for code in self.codes())
+
+    def __iter__(self):
+        return self.urls()
+
+    def nbytes(self):
+        """Size of the sorted buffer (codes added since the last compaction not included)."""
+        return len(self._blob)
@@ -0,0 +1,166 @@
+"""
+Local stand-in for the Discord invite API, for testing the validation stage
+without touching Discord. It answers GET /invites/{code} the way the real
+endpoint does: 200 with the invite (guild name, expires_at) for known codes,
+404 "Unknown Invite" for the rest, and rate-limit headers on every response
+(X-RateLimit-Limit / -Remaining / -Reset-After). A client that goes over the
+limit of its window gets a 429 with Retry-After and retry_after in the body.
+
+Serve it and point the scraper at it:
+    python invite_stub_server.py --valid-file valid_codes.txt --port 8000
+    python discord_scraper.py --validate --validation-endpoint "http://127.0.0.1:8000/invites/{code}"
+Or check InviteValidator against it end to end (classification and pacing):
+    python invite_stub_server.py --check 300
+"""
+
+import argparse
+import json
+import random
+import string
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from invite_set import to_code
+from invite_validator import EXPIRED, VALID, InviteValidator
+
+
+class StubInviteServer:
+    def __init__(self, valid_codes, port=0, host='127.0.0.1', limit=50, window=1.0):
+        """
+        Serve the invite API for valid_codes (every other code is unknown) from a
+        background thread. Clients may make limit requests per window seconds.
+        port=0 picks a free port; see endpoint for the URL template.
+        """
+        self.valid_codes = set(valid_codes)
+        self.limit = limit
+        self.window = window
+        self.stats = {'requests': 0, 'rate_limited': 0}
+        self._window_start = time.monotonic()
+        self._used = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                prefix, _, code = self.path.split('?')[0].rpartition('/')
+                if prefix != '/invites' or not code:
+                    self.send_error(404)
+                    return
+                allowed, remaining, reset_after = server._take()
+                headers = {'X-RateLimit-Limit': str(server.limit), 'X-RateLimit-Remaining': str(remaining),
+                           'X-RateLimit-Reset-After': f"{reset_after:.3f}"}
+                if not allowed:
+                    headers['Retry-After'] = f"{reset_after:.3f}"
+                    self._reply(429, {'message': 'You are being rate limited.', 'retry_after': round(reset_after, 3),
+                                      'global': False}, headers)
+                elif code in server.valid_codes:
+                    self._reply(200, {'code': code, 'expires_at': None,
+                                      'guild': {'id': str(abs(hash(code))), 'name': f"Server {code}"}}, headers)
+                else:
+                    self._reply(404, {'message': 'Unknown Invite', 'code': 10006}, headers)
+
+            def _reply(self, status, data, headers):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.address = self._httpd.server_address
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='invite-stub', daemon=True)
+        self._thread.start()
+
+    def _take(self):
+        """Count one request against the current window: (allowed, remaining, seconds until reset)."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._used = 0
+            reset_after = self.window - (now - self._window_start)
+            self.stats['requests'] += 1
+            if self._used >= self.limit:
+                self.stats['rate_limited'] += 1
+                return False, 0, reset_after
+            self._used += 1
+            return True, self.limit - self._used, reset_after
+
+    @property
+    def endpoint(self):
+        """URL template for InviteValidator / --validation-endpoint."""
+        return f"http://{self.address[0]}:{self.address[1]}/invites/{{code}}"
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def random_codes(count, seed=11):
+    rng = random.Random(seed)
+    return [''.join(rng.choices(string.ascii_letters + string.digits, k=rng.choice([7, 8, 10]))) for _ in range(count)]
+
+
+def check(count, limit, window, concurrency):
+    """Validate count codes (every other one valid) against a stub server; returns True if all were classified right."""
+    codes = random_codes(count)
+    valid_codes = set(codes[::2])
+    server = StubInviteServer(valid_codes, limit=limit, window=window)
+    validator = InviteValidator(server.endpoint, max_concurrency=concurrency)
+    start = time.perf_counter()
+    statuses = list(validator.validate(codes))
+    elapsed = time.perf_counter() - start
+    validator.engine.close()
+    server.close()
+
+    wrong = [status.code for status in statuses
+             if status.state != (VALID if status.code in valid_codes else EXPIRED)]
+    print(validator.summary())
+    print(f"{count} codes in {elapsed:.1f}s ({count / elapsed:.1f} codes/s, server limit "
+          f"{limit / window:.0f} req/s), server answered {server.stats['requests']} requests, "
+          f"{server.stats['rate_limited']} rate limited")
+    if wrong:
+        print(f"FAILED: {len(wrong)} codes classified wrong, e.g. {', '.join(wrong[:5])}")
+        return False
+    print("OK: every code classified correctly")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Discord invite API')
+    parser.add_argument('--port', type=int, default=8000, help='Port to serve on (default: 8000)')
+    parser.add_argument('--valid-file', metavar='FILE',
+                        help='Invite links or codes (one per line) to answer as valid; all others are unknown')
+    parser.add_argument('--limit', type=int, default=50, help='Requests allowed per window (default: 50)')
+    parser.add_argument('--window', type=float, default=1.0, help='Rate-limit window in seconds (default: 1)')
+    parser.add_argument('--check', type=int, metavar='N',
+                        help='Instead of serving, validate N generated codes against a stub server and report')
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='Validator concurrency for --check (default: 4)')
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.check, args.limit, args.window, args.concurrency) else 1)
+
+    valid_codes = set()
+    if args.valid_file:
+        with open(args.valid_file, 'r', encoding='utf-8') as f:
+            valid_codes = {to_code(line) for line in f} - {None}
+    server = StubInviteServer(valid_codes, port=args.port, limit=args.limit, window=args.window)
+    print(f"Serving {len(valid_codes)} valid invites at {server.endpoint} ({args.limit} requests per {args.window}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
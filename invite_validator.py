@@ -0,0 +1,213 @@
+"""
+Invite validation stage for the Discord scraper.
+Resolves invite codes against an invite endpoint concurrently, in batches,
+paced by a RateController that follows the rate-limit headers the server sends
+(Retry-After, X-RateLimit-Remaining / X-RateLimit-Reset-After). Every result (valid,
+expired or unknown) is cached on disk with a lifetime that depends on the
+result, so codes are not checked again before their entry goes stale.
+The endpoint is a URL template, so a local stand-in server (invite_stub_server.py)
+can replace Discord.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import requests
+
+from fetch_engine import AsyncFetchEngine, DEFAULT_HEADERS
+from rate_controller import RateController
+
+DEFAULT_ENDPOINT = 'https://discord.com/api/v10/invites/{code}'
+
+# Pacing of the invite endpoint: an API that announces its quota in X-RateLimit-*
+# headers, so the pace may rise well above what scraped sites are allowed
+VALIDATION_INITIAL_INTERVAL = 0.5
+VALIDATION_MIN_INTERVAL = 0.05
+
+VALID = 'valid'
+EXPIRED = 'expired'
+UNKNOWN = 'unknown'
+
+# Seconds a validation result is trusted before the code is checked again
+DEFAULT_VALIDATION_TTLS = {
+    VALID: 24 * 3600,
+    EXPIRED: 30 * 24 * 3600,  # deleted and expired invites do not come back
+    UNKNOWN: 3600,            # errors and unexpected statuses are retried soon
+}
+
+
+class InviteStatus:
+    """Validation result for one invite code."""
+
+    def __init__(self, code, state, checked_at=None, guild=None, expires_at=None, from_cache=False):
+        self.code = code
+        self.state = state
+        self.checked_at = checked_at or time.time()
+        self.guild = guild
+        self.expires_at = expires_at
+        self.from_cache = from_cache
+
+
+def _parse_timestamp(value):
+    """ISO 8601 timestamp from the API (e.g. 2025-01-01T00:00:00+00:00) to epoch seconds, or None."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class ValidationCache:
+    def __init__(self, path='invite_status.db', ttls=None):
+        """Open (or create) the validation cache; ttls maps a state to its lifetime in seconds."""
+        self.path = path
+        self.ttls = dict(DEFAULT_VALIDATION_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS status (
+                code TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                guild TEXT,
+                expires_at REAL,
+                checked_at REAL NOT NULL,
+                fresh_until REAL NOT NULL
+            )''')
+        self._conn.commit()
+
+    def get_fresh(self, codes):
+        """Return {code: InviteStatus} for the codes whose cached result is still fresh."""
+        now = time.time()
+        fresh = {}
+        for start in range(0, len(codes), 500):
+            chunk = codes[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT code, state, checked_at, guild, expires_at FROM status "
+                f"WHERE fresh_until > ? AND code IN ({','.join('?' * len(chunk))})", [now] + chunk)
+            for code, state, checked_at, guild, expires_at in rows:
+                fresh[code] = InviteStatus(code, state, checked_at, guild, expires_at, from_cache=True)
+        return fresh
+
+    def put_many(self, statuses):
+        """Store a batch of results in one transaction."""
+        rows = []
+        for status in statuses:
+            fresh_until = status.checked_at + self.ttls[status.state]
+            if status.state == VALID and status.expires_at:
+                # A temporary invite is re-checked once it is due to expire
+                fresh_until = min(fresh_until, status.expires_at)
+            rows.append((status.code, status.state, status.guild, status.expires_at, status.checked_at, fresh_until))
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO status (code, state, guild, expires_at, checked_at, fresh_until) '
+                'VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def close(self):
+        self._conn.close()
+
+
+class InviteValidator:
+    def __init__(self, endpoint=DEFAULT_ENDPOINT, cache=None, max_concurrency=4, batch_size=100,
+                 timeout=15, max_retries=3, rate_controller=None):
+        """
+        endpoint is a URL template with a {code} placeholder. cache is an optional
+        ValidationCache; codes with a fresh cached result are not requested again.
+        rate_controller paces the requests; by default the validator has its own, which
+        starts at VALIDATION_INITIAL_INTERVAL and may speed up to VALIDATION_MIN_INTERVAL
+        as far as the server's rate-limit headers allow.
+        """
+        self.endpoint = endpoint
+        self.cache = cache
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_controller = rate_controller or RateController(initial_interval=VALIDATION_INITIAL_INTERVAL,
+                                                                 min_interval=VALIDATION_MIN_INTERVAL)
+        self.engine = AsyncFetchEngine(max_concurrency=max_concurrency, per_host_limit=max_concurrency)
+        self.host = urlparse(endpoint).netloc.lower()
+        self.stats = {'cached': 0, 'requested': 0, 'rate_limited': 0, VALID: 0, EXPIRED: 0, UNKNOWN: 0}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'User-Agent': DEFAULT_HEADERS['User-Agent'], 'Accept': 'application/json'})
+            self._local.session = session
+        return session
+
+    def check(self, code):
+        """Resolve one code against the endpoint, retrying after rate limits."""
+        url = self.endpoint.format(code=code)
+        rate = self.rate_controller
+        for _ in range(self.max_retries + 1):
+            rate.wait(self.host, sleep=self.engine.idle)
+            try:
+                response = self._get_session().get(url, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                rate.observe(self.host, error=e)
+                return InviteStatus(code, UNKNOWN)
+            retry_after = None
+            if response.status_code == 429 and 'Retry-After' not in response.headers:
+                # Discord also sends the pause in the JSON body
+                try:
+                    retry_after = response.json().get('retry_after')
+                except ValueError:
+                    pass
+            rate.observe(self.host, response.status_code, response.headers, retry_after=retry_after)
+            if response.status_code == 429:
+                with self._lock:
+                    self.stats['rate_limited'] += 1
+                continue
+            if response.status_code == 200:
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = {}
+                guild = (data.get('guild') or {}).get('name')
+                return InviteStatus(code, VALID, guild=guild, expires_at=_parse_timestamp(data.get('expires_at')))
+            if response.status_code == 404:
+                return InviteStatus(code, EXPIRED)
+            return InviteStatus(code, UNKNOWN)
+        return InviteStatus(code, UNKNOWN)
+
+    def _validate_batch(self, codes):
+        fresh = self.cache.get_fresh(codes) if self.cache else {}
+        to_check = [code for code in codes if code not in fresh]
+        checked = self.engine.map(self.check, to_check, host=self.host)
+        checked = [status if isinstance(status, InviteStatus) else InviteStatus(code, UNKNOWN)
+                   for code, status in zip(to_check, checked)]
+        if self.cache and checked:
+            self.cache.put_many(checked)
+        self.stats['cached'] += len(fresh)
+        self.stats['requested'] += len(checked)
+        results = {status.code: status for status in checked}
+        results.update(fresh)
+        statuses = [results[code] for code in codes]
+        for status in statuses:
+            self.stats[status.state] += 1
+        return statuses
+
+    def validate(self, codes):
+        """Validate an iterable of codes batch by batch; yields an InviteStatus per code, in order."""
+        batch = []
+        for code in codes:
+            batch.append(code)
+            if len(batch) >= self.batch_size:
+                yield from self._validate_batch(batch)
+                batch = []
+        if batch:
+            yield from self._validate_batch(batch)
+
+    def summary(self):
+        s = self.stats
+        return (f"Validation: {s[VALID]} valid, {s[EXPIRED]} expired, {s[UNKNOWN]} unknown | "
+                f"{s['requested']} checked, {s['cached']} from cache, {s['rate_limited']} rate limited, "
+                f"{self.rate_controller.rate(self.host):.2f} req/s at the end")
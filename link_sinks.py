@@ -0,0 +1,198 @@
+"""
+Streaming output sinks for the Discord scraper.
+
+The link store is written at checkpoints; sinks get every newly discovered invite as
+soon as it is found, with where and when it was found:
+    JSONLSink   appends one JSON object per invite to a file
+    CSVSink     appends one CSV row per invite (header written to a new file)
+    StdoutSink  writes to standard output for piping into other tools, either the
+                bare invite URL per line ('link') or JSON lines ('jsonl')
+LinkSinks buffers discoveries and hands them to every sink in batches, when the
+buffer fills up or at the latest flush_interval seconds after the first one.
+Delivery is at least once: a run that crashes before its checkpoint rediscovers
+the same invites on resume, so consumers should deduplicate on the code field.
+"""
+
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from invite_extractor import invite_url
+from invite_set import to_code
+
+SINK_FORMATS = ('jsonl', 'csv', 'stdout')
+
+# Fields of every streamed record, in CSV column order
+FIELDS = ('link', 'code', 'source_url', 'query', 'found_at')
+
+
+def make_record(code, source_url, query, seen_at):
+    return {'link': invite_url(code), 'code': code, 'source_url': source_url, 'query': query,
+            'found_at': datetime.fromtimestamp(seen_at, timezone.utc).isoformat(timespec='seconds')}
+
+
+class JSONLSink:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, records):
+        self._file.write(''.join(json.dumps(record) + '\n' for record in records))
+        self._file.flush()
+
+    def describe(self):
+        return self.path
+
+    def close(self):
+        self._file.close()
+
+
+class CSVSink:
+    def __init__(self, path):
+        self.path = path
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=FIELDS)
+        if new_file:
+            self._writer.writeheader()
+
+    def write(self, records):
+        self._writer.writerows(records)
+        self._file.flush()
+
+    def describe(self):
+        return self.path
+
+    def close(self):
+        self._file.close()
+
+
+class StdoutSink:
+    def __init__(self, mode='link', stream=None):
+        """mode 'link' writes bare invite URLs, 'jsonl' whole records. stream defaults to sys.stdout."""
+        if mode not in ('link', 'jsonl'):
+            raise ValueError(f"Unknown stdout mode: {mode} (use link or jsonl)")
+        self.mode = mode
+        self.stream = stream or sys.stdout
+
+    def write(self, records):
+        if self.mode == 'jsonl':
+            self.stream.write(''.join(json.dumps(record) + '\n' for record in records))
+        else:
+            self.stream.write(''.join(record['link'] + '\n' for record in records))
+        self.stream.flush()
+
+    def describe(self):
+        return f"stdout ({self.mode})"
+
+    def close(self):
+        # The stream belongs to the process; only push out what is buffered
+        self.stream.flush()
+
+
+def open_sink(spec, stdout=None):
+    """
+    Open a sink from a spec: 'jsonl:PATH', 'csv:PATH', 'stdout' or 'stdout:jsonl'.
+    stdout is the stream the stdout sink writes to (default: sys.stdout).
+    """
+    kind, _, target = spec.partition(':')
+    if kind == 'jsonl' and target:
+        return JSONLSink(target)
+    if kind == 'csv' and target:
+        return CSVSink(target)
+    if kind == 'stdout':
+        return StdoutSink(target or 'link', stream=stdout)
+    raise ValueError(f"Invalid sink: {spec} (use jsonl:FILE, csv:FILE, stdout or stdout:jsonl)")
+
+
+class LinkSinks:
+    def __init__(self, sinks, flush_interval=1.0, max_buffer=500):
+        """
+        Fan new invites out to sinks. Records are buffered and written when max_buffer
+        are waiting or flush_interval seconds after the oldest arrived, whichever comes first.
+        """
+        self.sinks = list(sinks)
+        self.flush_interval = flush_interval
+        self.max_buffer = max(1, max_buffer)
+        self.stats = {'streamed': 0, 'flushes': 0, 'max_delay': 0.0}
+        self._buffer = []
+        self._oldest = None
+        # Codes streamed this run: an invite found on several pages goes out once
+        self._streamed = set()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='link-sinks', daemon=True)
+        self._flusher.start()
+
+    def emit(self, links, source_url, query=None, seen_at=None):
+        """Queue the invites among links not streamed before this run. Returns how many were queued."""
+        seen_at = seen_at or time.time()
+        queued = 0
+        with self._lock:
+            for link in links:
+                code = to_code(link)
+                if code is None or code in self._streamed:
+                    continue
+                self._streamed.add(code)
+                self._buffer.append(make_record(code, source_url, query, seen_at))
+                queued += 1
+            if self._buffer and self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._buffer) >= self.max_buffer
+        if full:
+            self.flush()
+        return queued
+
+    def _flush_loop(self):
+        # Wake often enough that no record waits much longer than flush_interval
+        tick = max(0.05, self.flush_interval / 4)
+        while not self._closed.wait(tick):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            if due:
+                self.flush()
+
+    def flush(self):
+        """Write every buffered record to every sink now."""
+        # One writer at a time keeps the records of each sink in discovery order
+        with self._write_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+                oldest, self._oldest = self._oldest, None
+            if not records:
+                return
+            for sink in list(self.sinks):
+                try:
+                    sink.write(records)
+                except OSError as e:
+                    # A full disk or a closed pipe (the consumer went away) stops
+                    # that sink; the run and the other sinks carry on
+                    print(f"Stopped streaming to {sink.describe()}: {str(e)}", file=sys.stderr)
+                    self.sinks.remove(sink)
+            self.stats['streamed'] += len(records)
+            self.stats['flushes'] += 1
+            self.stats['max_delay'] = max(self.stats['max_delay'], time.monotonic() - oldest)
+
+    def summary(self):
+        s = self.stats
+        targets = ', '.join(sink.describe() for sink in self.sinks) or 'no sinks left'
+        return (f"Streamed: {s['streamed']} new links in {s['flushes']} flushes to {targets}, "
+                f"at most {s['max_delay']:.1f}s after discovery")
+
+    def close(self):
+        """Flush what is buffered, stop the flusher and close the sinks."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except OSError:
+                pass
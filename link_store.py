@@ -0,0 +1,291 @@
+"""
+Link persistence for the Discord scraper.
+
+Two backends share one interface (load / save / compact):
+    LinkJournal     text backend. The output file is a sorted snapshot; links found
+                    since the last compaction are appended to <output>.journal and
+                    fsynced at every checkpoint. Compaction writes a new sorted snapshot.
+    SQLiteLinkStore indexed SQLite backend that also records where each invite was
+                    found (source URL, query, site, keyword) and when it was first and
+                    last seen. The text file is kept as an export.
+"""
+
+import os
+import re
+import sqlite3
+import time
+
+from invite_extractor import find_invite_codes, invite_code, invite_url
+from invite_set import InviteSet
+
+LINK_STORES = ('text', 'sqlite')
+
+SITE_OPERATOR_PATTERN = re.compile(r'site:(\S+)')
+# Parts of a generated query that are not keywords: site: operators and quoted phrases
+NON_KEYWORD_PATTERN = re.compile(r'site:\S+|"[^"]*"')
+
+
+def query_site(query):
+    """Return the site: operator target of a query, or None."""
+    match = SITE_OPERATOR_PATTERN.search(query or '')
+    return match.group(1).lower() if match else None
+
+
+def query_keywords(query):
+    """Return the keywords of a generated query, e.g. 'crypto blockchain'."""
+    return ' '.join(NON_KEYWORD_PATTERN.sub(' ', query or '').lower().split()) or None
+
+
+def write_link_file(path, urls):
+    """Atomically replace path with urls (already sorted), one per line."""
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.writelines(f"{url}\n" for url in urls)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+    _fsync_dir(path)
+
+
+def _fsync_dir(path):
+    """Persist a rename in the directory holding path (not supported on Windows)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class LinkJournal:
+    # Only the links themselves are kept; save() ignores sightings
+    tracks_provenance = False
+
+    def __init__(self, snapshot_file='invite_link.txt'):
+        """
+        snapshot_file is the sorted, canonical link file;
+        the journal lives alongside it as snapshot_file + '.journal'.
+        """
+        self.snapshot_file = snapshot_file
+        self.journal_file = snapshot_file + '.journal'
+        self.replayed = 0
+
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        """
+        Replay snapshot plus journal and return an InviteSet. Every invite form in
+        the files (discord.com/invite/, discordapp.com/invite/, ...) loads as its code.
+        """
+        snapshot = self._read(self.snapshot_file)
+        journal = self._read(self.journal_file)
+        if snapshot is None and journal is None:
+            raise FileNotFoundError(self.snapshot_file)
+        # The snapshot is replaced atomically; only the journal can end in a line
+        # torn by a crash mid-append, and everything after its last newline is dropped
+        journal = journal[:journal.rfind('\n') + 1] if journal else ''
+        journal_codes = find_invite_codes(journal)
+        self.replayed = len(journal_codes)
+        return InviteSet.from_codes(find_invite_codes(snapshot or '') + journal_codes)
+
+    def iter_codes(self):
+        """
+        Stream the invite codes of snapshot plus journal (repeats included) a block of
+        lines at a time, for indexes that must not hold the whole file in memory.
+        """
+        if not (os.path.exists(self.snapshot_file) or os.path.exists(self.journal_file)):
+            raise FileNotFoundError(self.snapshot_file)
+        for path in (self.snapshot_file, self.journal_file):
+            try:
+                f = open(path, 'r', encoding='utf-8')
+            except FileNotFoundError:
+                continue
+            with f:
+                while True:
+                    block = f.read(1 << 20)
+                    if not block:
+                        break
+                    block += f.readline()
+                    # Only the last line of the file can lack its newline: a torn journal append
+                    if path == self.journal_file and not block.endswith('\n'):
+                        block = block[:block.rfind('\n') + 1]
+                    yield from find_invite_codes(block)
+
+    def signature(self):
+        """Identify the current state of both files (path, size and modification time)."""
+        parts = [os.path.abspath(self.snapshot_file)]
+        for path in (self.snapshot_file, self.journal_file):
+            try:
+                st = os.stat(path)
+                parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+            except FileNotFoundError:
+                parts.append('-')
+        return 'text:' + '|'.join(parts)
+
+    def describe_load(self):
+        return f" ({self.replayed} from journal)" if self.replayed else ""
+
+    def save(self, new_links, sightings=None):
+        """Checkpoint: append the new links to the journal."""
+        self.append(new_links)
+
+    def append(self, links):
+        """Durably append links to the journal: written, flushed and fsynced before returning."""
+        if not links:
+            return
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(''.join(f"{link}\n" for link in links))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self, links):
+        """
+        Write links (an InviteSet or any iterable of links) as the new sorted,
+        canonical snapshot and empty the journal.
+        The snapshot is replaced atomically, so a crash leaves either the old
+        snapshot plus journal or the new snapshot, never a truncated file.
+        """
+        # InviteSet and InviteIndex both stream their invites as sorted URLs
+        if not hasattr(links, 'urls'):
+            links = InviteSet(links)
+        write_link_file(self.snapshot_file, links.urls())
+        # Links replayed twice are harmless, so the journal is only cleared after the replace
+        with open(self.journal_file, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def journal_size(self):
+        try:
+            return os.path.getsize(self.journal_file)
+        except FileNotFoundError:
+            return 0
+
+
+class SQLiteLinkStore:
+    tracks_provenance = True
+
+    def __init__(self, db_file='invite_links.db', export_file='invite_link.txt'):
+        """
+        Open (or create) the link database. export_file is the plain text link list
+        written by compact(); if the database is new, links already in it are imported.
+        """
+        self.db_file = db_file
+        self.export_file = export_file
+        self.imported = 0
+        self._conn = sqlite3.connect(db_file, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS invites (
+                code TEXT PRIMARY KEY,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sightings (
+                code TEXT NOT NULL,
+                source_url TEXT NOT NULL DEFAULT '',
+                query TEXT NOT NULL DEFAULT '',
+                site TEXT,
+                keyword TEXT,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (code, source_url, query)
+            );
+            CREATE INDEX IF NOT EXISTS invites_first_seen ON invites (first_seen);
+            CREATE INDEX IF NOT EXISTS sightings_site ON sightings (site, first_seen);
+            CREATE INDEX IF NOT EXISTS sightings_keyword ON sightings (keyword, first_seen);
+        ''')
+        self._conn.commit()
+
+    def load(self):
+        """Return every stored invite as an InviteSet, importing export_file into a new database."""
+        return InviteSet.from_codes(self.iter_codes())
+
+    def iter_codes(self):
+        """Stream every stored invite code in sorted order."""
+        if self._conn.execute('SELECT COUNT(*) FROM invites').fetchone()[0] == 0:
+            self._import_text()
+        return (code for (code,) in self._conn.execute('SELECT code FROM invites ORDER BY code'))
+
+    def signature(self):
+        """Identify the current set of invites (database path, count and newest first_seen)."""
+        count, newest = self._conn.execute('SELECT COUNT(*), MAX(first_seen) FROM invites').fetchone()
+        return f"sqlite:{os.path.abspath(self.db_file)}|{count}|{newest}"
+
+    def _import_text(self):
+        try:
+            links = LinkJournal(self.export_file).load()
+        except FileNotFoundError:
+            return
+        now = time.time()
+        rows = [(code, now, now) for code in links.codes()]
+        with self._conn:
+            self._conn.executemany('INSERT OR IGNORE INTO invites (code, first_seen, last_seen) VALUES (?, ?, ?)', rows)
+        self.imported = len(rows)
+
+    def describe_load(self):
+        return f" (imported {self.imported} from {self.export_file})" if self.imported else ""
+
+    def save(self, new_links, sightings=None):
+        """
+        Checkpoint: write a batch of sightings in one transaction.
+        sightings are (link, source_url, query, seen_at) tuples; links seen again
+        only move their last_seen forward.
+        """
+        invite_rows = []
+        sighting_rows = []
+        for link, source_url, query, seen_at in sightings or []:
+            code = invite_code(link)
+            if not code:
+                continue
+            invite_rows.append((code, seen_at, seen_at))
+            sighting_rows.append((code, source_url or '', query or '', query_site(query), query_keywords(query),
+                                  seen_at, seen_at))
+        now = time.time()
+        invite_rows.extend((code, now, now) for code in filter(None, map(invite_code, new_links)))
+        if not invite_rows:
+            return
+        with self._conn:
+            self._conn.executemany(
+                'INSERT INTO invites (code, first_seen, last_seen) VALUES (?, ?, ?) '
+                'ON CONFLICT (code) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)',
+                invite_rows)
+            self._conn.executemany(
+                'INSERT INTO sightings (code, source_url, query, site, keyword, first_seen, last_seen) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (code, source_url, query) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)',
+                sighting_rows)
+
+    def compact(self, links=None):
+        """Export every stored invite to the sorted text file."""
+        rows = self._conn.execute('SELECT code FROM invites ORDER BY code')
+        write_link_file(self.export_file, (invite_url(code) for (code,) in rows))
+
+    def new_since(self, timestamp):
+        """Invites first seen at or after timestamp, oldest first, as (url, first_seen)."""
+        rows = self._conn.execute('SELECT code, first_seen FROM invites WHERE first_seen >= ? ORDER BY first_seen',
+                                  (timestamp,))
+        return [(invite_url(code), first_seen) for code, first_seen in rows]
+
+    def by_site(self, site):
+        """Invites found through searches of a site, as (url, first_seen)."""
+        rows = self._conn.execute('SELECT code, MIN(first_seen) FROM sightings WHERE site = ? '
+                                  'GROUP BY code ORDER BY MIN(first_seen)', (site.lower(),))
+        return [(invite_url(code), first_seen) for code, first_seen in rows]
+
+    def by_keyword(self, keyword):
+        """Invites found by queries for a keyword set (e.g. 'crypto' or 'crypto blockchain')."""
+        rows = self._conn.execute('SELECT code, MIN(first_seen) FROM sightings WHERE keyword = ? '
+                                  'GROUP BY code ORDER BY MIN(first_seen)', (keyword.lower(),))
+        return [(invite_url(code), first_seen) for code, first_seen in rows]
+
+    def close(self):
+        self._conn.close()
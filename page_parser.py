@@ -0,0 +1,219 @@
+"""
+HTML parsing for search result pages and scraped pages.
+Collects only what invite extraction reads: the page text, anchor targets
+(with Google /url?q= redirects decoded) and meta tag contents.
+
+Three backends are available:
+    html.parser  BeautifulSoup tree built by the pure-Python parser, walked once
+    lxml         lxml's C tokenizer feeding a collector target; no tree is built
+    stream       the standard library HTMLParser tokenizer feeding the same collector;
+                 no tree is built and no third-party parser is needed
+"""
+
+from html.parser import HTMLParser
+from urllib.parse import urlparse, parse_qs
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+PARSER_BACKENDS = ('html.parser', 'lxml', 'stream')
+DEFAULT_BACKEND = 'lxml' if etree is not None else 'html.parser'
+
+# Tags whose text flows into their neighbours without a break
+INLINE_TAGS = frozenset(['b', 'em', 'i', 'mark', 'small', 'strong', 'sub', 'sup', 'u', 'wbr'])
+
+# Tags whose content is not page text (BeautifulSoup's get_text() skips them too)
+SKIP_TEXT_TAGS = frozenset(['script', 'style', 'template'])
+
+# Tags that never have an end tag in HTML
+VOID_TAGS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                       'link', 'meta', 'param', 'source', 'track', 'wbr'])
+
+
+def decode_google_href(href):
+    """Return the target of a Google /url?q= redirect link, or href unchanged."""
+    if '/url?' not in href:
+        return href
+    params = parse_qs(urlparse(href).query)
+    target = params.get('q') or params.get('url')
+    return target[0] if target else href
+
+
+def resolve_backend(backend):
+    """Validate a backend name, falling back to html.parser when lxml is not installed."""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend '{backend}'. Choose from: {', '.join(PARSER_BACKENDS)}")
+    if backend == 'lxml' and etree is None:
+        print("lxml is not installed, using html.parser instead")
+        return 'html.parser'
+    return backend
+
+
+class PageContent:
+    """The parts of a parsed page that invite extraction reads."""
+
+    def __init__(self, text='', hrefs=None, meta_contents=None):
+        self.text = text
+        self.hrefs = hrefs or []
+        self.meta_contents = meta_contents or []
+
+    def attribute_text(self):
+        """Join hrefs and meta contents so they can be scanned in one pass."""
+        return '\n'.join(self.hrefs + self.meta_contents)
+
+
+class _ContentCollector:
+    """Tokenizer target that keeps anchors, meta contents and text nodes and drops everything else."""
+
+    def __init__(self):
+        self.text_parts = []
+        self.hrefs = []
+        self.meta_contents = []
+        self.skip_depth = 0
+
+    def start(self, tag, attrs):
+        if tag == 'a':
+            href = attrs.get('href')
+            if href:
+                self.hrefs.append(decode_google_href(href))
+        elif tag == 'meta':
+            content = attrs.get('content')
+            if content:
+                self.meta_contents.append(content)
+        elif tag in SKIP_TEXT_TAGS:
+            self.skip_depth += 1
+        if tag in VOID_TAGS and tag not in INLINE_TAGS:
+            self.text_parts.append('\n')
+
+    def end(self, tag):
+        if tag in SKIP_TEXT_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        if tag not in INLINE_TAGS and tag not in VOID_TAGS:
+            self.text_parts.append('\n')
+
+    def data(self, data):
+        if not self.skip_depth:
+            self.text_parts.append(data)
+
+    def close(self):
+        return PageContent(''.join(self.text_parts), self.hrefs, self.meta_contents)
+
+
+class _StreamParser(HTMLParser):
+    """Standard library tokenizer forwarding events to a _ContentCollector."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.collector = _ContentCollector()
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+        if tag not in VOID_TAGS:
+            self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in VOID_TAGS:
+            self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def decode_html(content, encoding=None):
+    """Decode a document's bytes with its charset; an unknown charset name falls back to utf-8."""
+    try:
+        return content.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+def _parse_soup(html, encoding=None):
+    """
+    Walk a BeautifulSoup tree once; the text is built exactly once. Unlike the lxml and
+    stream backends this builds the full tree for every page, since a SoupStrainer can
+    keep anchors and meta tags but would drop the text around them.
+    """
+    if isinstance(html, bytes):
+        html = decode_html(html, encoding)
+    soup = BeautifulSoup(html, 'html.parser')
+    string_types = soup.interesting_string_types or (NavigableString, CData)
+    text_parts = []
+    hrefs = []
+    meta_contents = []
+
+    stack = [iter(soup.contents)]
+    closing = [None]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            if closing.pop():
+                text_parts.append('\n')
+            continue
+        if isinstance(node, Tag):
+            if node.name == 'a':
+                href = node.get('href')
+                if href:
+                    hrefs.append(decode_google_href(href))
+            elif node.name == 'meta':
+                content = node.get('content')
+                if content:
+                    meta_contents.append(content)
+            stack.append(iter(node.contents))
+            closing.append(node.name not in INLINE_TAGS)
+        elif type(node) in string_types:
+            text_parts.append(node)
+
+    return PageContent(''.join(text_parts), hrefs, meta_contents)
+
+
+def _parse_lxml(html, encoding=None):
+    """Tokenize with lxml into a collector target, without building a tree."""
+    if isinstance(html, bytes):
+        # Bytes go to lxml's own decoder; a charset it does not know is decoded here
+        try:
+            parser = etree.HTMLParser(target=_ContentCollector(), encoding=encoding or 'utf-8')
+        except LookupError:
+            html = decode_html(html, encoding)
+    if isinstance(html, str):
+        # lxml rejects str input that carries an encoding declaration
+        html = html.encode('utf-8')
+        parser = etree.HTMLParser(target=_ContentCollector(), encoding='utf-8')
+    content = etree.fromstring(html, parser)
+    # lxml returns None from close() for empty documents
+    return content if content is not None else PageContent()
+
+
+def _parse_stream(html, encoding=None):
+    """Tokenize with the standard library HTMLParser, without building a tree."""
+    if isinstance(html, bytes):
+        html = decode_html(html, encoding)
+    parser = _StreamParser()
+    parser.feed(html)
+    parser.close()
+    return parser.collector.close()
+
+
+def parse_page(html, backend=None, encoding=None):
+    """
+    Parse html (str, or bytes in encoding, default utf-8) and collect its text, hrefs and meta contents.
+    Inline formatting tags are joined without a separator (Google bolds query
+    terms inside invite URLs); every other element ends with a newline so text
+    from adjacent results never runs together.
+    Only the lxml and stream backends collect these without building a document
+    tree; html.parser builds the full BeautifulSoup tree.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend == 'lxml' and etree is not None:
+        return _parse_lxml(html, encoding)
+    if backend == 'stream':
+        return _parse_stream(html, encoding)
+    return _parse_soup(html, encoding)
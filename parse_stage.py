@@ -0,0 +1,112 @@
+"""
+Parse/extract stage for the Discord scraper.
+Fetchers hand over the raw bytes of every document the invite prefilter could
+not settle; the stage decodes and parses them and sends back only the invite
+codes found. With workers > 0 it runs on a process pool, so parsing uses
+several cores instead of competing with the fetch threads for the GIL. The
+number of documents in flight is bounded: submit() blocks once the queue is
+full, which holds the fetchers back until the parsers catch up.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from invite_extractor import extract_invite_codes
+from page_parser import parse_page
+
+
+def extract_codes(content, encoding, backend):
+    """
+    Parse one document (bytes in encoding) and return the sorted invite codes in its
+    text, anchor targets and meta contents. Runs in the worker processes.
+    """
+    return timed_extract_codes(content, encoding, backend)[0]
+
+
+def timed_extract_codes(content, encoding, backend):
+    """extract_codes() that also returns the seconds spent decoding and parsing, and extracting."""
+    start = time.perf_counter()
+    # The backend decodes: lxml reads the bytes itself instead of a str re-encoded to UTF-8
+    page = parse_page(content, backend, encoding)
+    parsed = time.perf_counter()
+    codes = extract_invite_codes(page.text)
+    codes.update(extract_invite_codes(page.attribute_text()))
+    return sorted(codes), parsed - start, time.perf_counter() - parsed
+
+
+class ParseStage:
+    def __init__(self, backend, workers=0, max_pending=None, metrics=None):
+        """
+        workers 0 parses in the calling thread; a negative value uses every core.
+        max_pending bounds the documents queued or in flight (default: 4 per worker).
+        metrics is an optional run_metrics.RunMetrics that gets the parse and
+        extraction time of every document, measured where it was parsed.
+        """
+        if workers < 0:
+            workers = os.cpu_count() or 1
+        self.backend = backend
+        self.workers = workers
+        self.max_pending = max_pending or max(1, 4 * workers)
+        self.metrics = metrics
+        self.stats = {'documents': 0, 'bytes': 0, 'peak_pending': 0}
+        # Worker processes start with the first document and stop on close()
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, content, encoding):
+        """
+        Queue one document; returns a Future for its sorted invite codes. Blocks
+        while max_pending documents are already queued or being parsed.
+        """
+        self.stats['documents'] += 1
+        self.stats['bytes'] += len(content)
+        if not self.workers:
+            future = Future()
+            try:
+                future.set_result(self._record(timed_extract_codes(content, encoding, self.backend)))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._slots.acquire()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        with self._lock:
+            self._pending += 1
+            self.stats['peak_pending'] = max(self.stats['peak_pending'], self._pending)
+        timed = self._executor.submit(timed_extract_codes, content, encoding, self.backend)
+        future = Future()
+        timed.add_done_callback(lambda done: self._release(done, future))
+        return future
+
+    def _record(self, timed):
+        codes, parse_seconds, extract_seconds = timed
+        if self.metrics:
+            self.metrics.add_time('parse', parse_seconds)
+            self.metrics.add_time('extract', extract_seconds)
+        return codes
+
+    def _release(self, timed, future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+        try:
+            future.set_result(self._record(timed.result()))
+        except Exception as e:
+            future.set_exception(e)
+
+    def summary(self):
+        s = self.stats
+        line = f"Parse stage: {s['documents']} documents parsed ({s['bytes'] / 1024 / 1024:.1f} MiB)"
+        if not self.workers:
+            return line + " in process"
+        return line + f" by {self.workers} worker processes, peak queue {s['peak_pending']}/{self.max_pending}"
+
+    def close(self):
+        """Stop the worker processes; a later submit() starts new ones."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,101 @@
+"""
+Query planning for the Discord scraper.
+Turns the generated (source_type, query) pairs into an explicit plan of Google
+searches, one per (site, keyword set), counts the real HTTP requests each one
+costs (HTML result page, Custom Search API pages, or nothing when cached) and
+cuts the plan at the request budget. A plan can be printed without running it,
+with an estimate of how long the run will take.
+"""
+
+# Average seconds per uncached Google request, for duration estimates
+REQUEST_SECONDS = 1.5
+
+
+class PlannedSearch:
+    """One generated query and the Google searches that serve it."""
+
+    def __init__(self, source_type, query, google_queries, requests, via):
+        self.source_type = source_type
+        self.query = query
+        self.google_queries = google_queries
+        self.requests = requests
+        self.via = via
+
+
+class QueryPlan:
+    def __init__(self, searches, max_requests, over_budget=0, duplicates=0):
+        self.searches = searches
+        # Position in the plan identifies a search in run checkpoints
+        for index, search in enumerate(searches):
+            search.index = index
+        self.max_requests = max_requests
+        self.over_budget = over_budget
+        self.duplicates = duplicates
+
+    @property
+    def requests(self):
+        return sum(search.requests for search in self.searches)
+
+    def estimated_seconds(self, concurrency, interval, searches=None):
+        """
+        Requests go to Google concurrency at a time, one started every interval
+        seconds at most, so the slower of the two limits sets the pace. searches
+        limits the estimate to part of the plan.
+        """
+        requests = self.requests if searches is None else sum(search.requests for search in searches)
+        return requests * max(interval, REQUEST_SECONDS / concurrency)
+
+    def summary_lines(self, concurrency, interval, searches=None):
+        """
+        Totals and estimated duration of the plan. searches are the ones still to run
+        (of a resumed run); when some are already done, only those are counted.
+        """
+        pace = f"at concurrency {concurrency}, {interval:.1f}s between requests"
+        if searches is not None and len(searches) < len(self.searches):
+            minutes, seconds = divmod(int(self.estimated_seconds(concurrency, interval, searches)), 60)
+            requests = sum(search.requests for search in searches)
+            lines = [f"Plan: {len(searches)} of {len(self.searches)} searches left, {requests} of {self.requests} "
+                     f"HTTP requests (~{minutes}m {seconds:02d}s {pace})"]
+        else:
+            minutes, seconds = divmod(int(self.estimated_seconds(concurrency, interval)), 60)
+            lines = [f"Plan: {len(self.searches)} searches, {self.requests}/{self.max_requests} HTTP requests "
+                     f"(~{minutes}m {seconds:02d}s {pace})"]
+        if self.over_budget or self.duplicates:
+            lines.append(f"Not planned: {self.over_budget} over the request budget, {self.duplicates} duplicate searches")
+        return lines
+
+    def describe(self, concurrency, interval):
+        """Printable lines: every planned search, then the totals."""
+        lines = []
+        for i, search in enumerate(self.searches, 1):
+            for google_query in search.google_queries:
+                lines.append(f"[{i:>3}] {search.via:<10} {search.requests} req  {google_query}")
+        return lines + self.summary_lines(concurrency, interval)
+
+
+def build_plan(queries, expand, cost, max_requests):
+    """
+    Plan (source_type, query) pairs in order until max_requests HTTP requests are used.
+    expand(source_type, query) returns the Google queries for a pair;
+    cost(google_query) returns (requests, via). Google queries planned once are not repeated.
+    """
+    searches = []
+    planned = set()
+    used = 0
+    over_budget = duplicates = 0
+    for source_type, query in queries:
+        google_queries = [q for q in expand(source_type, query) if q not in planned]
+        if not google_queries:
+            duplicates += 1
+            continue
+        costs = [cost(q) for q in google_queries]
+        requests = sum(requests for requests, _ in costs)
+        if used + requests > max_requests:
+            # Keep scanning: a later search may be cached and cost nothing
+            over_budget += 1
+            continue
+        planned.update(google_queries)
+        used += requests
+        via = '+'.join(sorted({via for _, via in costs}))
+        searches.append(PlannedSearch(source_type, query, google_queries, requests, via))
+    return QueryPlan(searches, max_requests, over_budget, duplicates)
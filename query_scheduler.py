@@ -0,0 +1,150 @@
+"""
+Adaptive, yield-driven query scheduler.
+Keeps persistent statistics of how many new links each generated query found
+per Google request, and picks the queries of the next run by expected yield.
+Queries with little history borrow the yield of their site and keywords.
+A share of the budget always goes to exploring other queries, favoring the
+ones that have run least, so low-yield queries keep being re-measured.
+"""
+
+import random
+import sqlite3
+import time
+
+from link_store import query_keywords, query_site
+
+# Weight of past observations per new one, so yields follow recent runs
+DECAY = 0.9
+# Pseudo-requests the site/keyword prior counts for in a query's estimate
+PRIOR_WEIGHT = 2.0
+SCHEDULES = ('adaptive', 'fixed')
+
+
+class QueryScheduler:
+    def __init__(self, path='query_stats.db', explore_rate=0.2, seed=None):
+        """
+        Open (or create) the statistics file. explore_rate is the share of each run's
+        searches spent on queries outside the top expected yields.
+        """
+        self.path = path
+        self.explore_rate = explore_rate
+        self._rng = random.Random(seed)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS query_stats (
+                query TEXT PRIMARY KEY,
+                source_type TEXT NOT NULL,
+                site TEXT,
+                keyword TEXT,
+                requests REAL NOT NULL,
+                new_links REAL NOT NULL,
+                runs INTEGER NOT NULL,
+                last_run REAL NOT NULL
+            )''')
+        self._conn.commit()
+        # Expected new links per request of every query scheduled this run
+        self.expected = {}
+        self.explored = set()
+        self._runs = {}
+        self.run_stats = {'searches': 0, 'requests': 0, 'new_links': 0, 'expected_links': 0.0,
+                          'explored': 0, 'explored_links': 0}
+
+    def estimates(self, queries):
+        """
+        Expected new links per request for each (source_type, query) pair, or None
+        without any history. A query's own record is blended with a prior of its site's
+        yield times how much better or worse its keywords did than their sites predicted.
+        """
+        rows = self._conn.execute('SELECT query, site, keyword, requests, new_links, runs FROM query_stats').fetchall()
+        if not rows:
+            return None
+        total_requests = sum(row[3] for row in rows)
+        global_rate = sum(row[4] for row in rows) / total_requests if total_requests else 0.0
+
+        site_totals = {}
+        for _, site, _, requests, new_links, _ in rows:
+            links, reqs = site_totals.get(site, (0.0, 0.0))
+            site_totals[site] = (links + new_links, reqs + requests)
+        site_rates = {site: links / reqs for site, (links, reqs) in site_totals.items() if reqs > 0}
+
+        # Keyword factor: links found / links their sites' yields predicted, shrunk toward 1
+        keyword_totals = {}
+        for _, site, keyword, requests, new_links, _ in rows:
+            found, predicted = keyword_totals.get(keyword, (0.0, 0.0))
+            keyword_totals[keyword] = (found + new_links, predicted + requests * site_rates.get(site, global_rate))
+        keyword_factors = {keyword: (found + 1) / (predicted + 1) for keyword, (found, predicted) in keyword_totals.items()}
+
+        history = {row[0]: (row[3], row[4]) for row in rows}
+        self._runs = {row[0]: row[5] for row in rows}
+        estimates = {}
+        for _, query in queries:
+            prior = site_rates.get(query_site(query), global_rate) * keyword_factors.get(query_keywords(query), 1.0)
+            requests, new_links = history.get(query, (0.0, 0.0))
+            estimates[query] = (new_links + prior * PRIOR_WEIGHT) / (requests + PRIOR_WEIGHT)
+        return estimates
+
+    def schedule(self, queries, max_searches):
+        """
+        Pick and order up to max_searches (source_type, query) pairs. Without any
+        history the generated order is kept.
+        """
+        budget = min(len(queries), max_searches)
+        estimates = self.estimates(queries)
+        if estimates is None:
+            return queries[:budget]
+
+        explore_count = int(round(budget * self.explore_rate))
+        ranked = sorted(range(len(queries)), key=lambda i: (-estimates[queries[i][1]], i))
+        chosen = ranked[:budget - explore_count]
+
+        # Exploration: sample the rest, weighting queries that have run least
+        rest = ranked[budget - explore_count:]
+        weights = [1.0 / (1 + self._runs.get(queries[i][1], 0)) for i in rest]
+        explored = []
+        while rest and len(explored) < explore_count:
+            pick = self._rng.choices(range(len(rest)), weights)[0]
+            explored.append(rest.pop(pick))
+            weights.pop(pick)
+
+        self.expected = {queries[i][1]: estimates[queries[i][1]] for i in chosen + explored}
+        self.explored = {queries[i][1] for i in explored}
+        return [queries[i] for i in chosen + explored]
+
+    def restore(self, expected, explored):
+        """Reinstate the estimates of a resumed run's plan."""
+        self.expected = dict(expected)
+        self.explored = set(explored)
+
+    def record(self, source_type, query, requests, new_links):
+        """Fold one search's outcome (Google requests made, new links found) into the statistics."""
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                'INSERT INTO query_stats (query, source_type, site, keyword, requests, new_links, runs, last_run) '
+                'VALUES (?, ?, ?, ?, ?, ?, 1, ?) '
+                'ON CONFLICT (query) DO UPDATE SET requests = requests * ? + excluded.requests, '
+                'new_links = new_links * ? + excluded.new_links, runs = runs + 1, last_run = excluded.last_run',
+                (query, source_type, query_site(query), query_keywords(query), requests, new_links, now, DECAY, DECAY))
+        s = self.run_stats
+        s['searches'] += 1
+        s['requests'] += requests
+        s['new_links'] += new_links
+        if query in self.expected:
+            s['expected_links'] += self.expected[query] * requests
+        if query in self.explored:
+            s['explored'] += 1
+            s['explored_links'] += new_links
+
+    def summary(self):
+        s = self.run_stats
+        requests = max(s['requests'], 1)
+        if not self.expected:
+            return (f"Query scheduler: no history yet, generated order used; "
+                    f"{s['new_links']} new links from {s['requests']} requests")
+        return (f"Query scheduler: expected {s['expected_links']:.1f} new links ({s['expected_links'] / requests:.2f}/request), "
+                f"actual {s['new_links']} ({s['new_links'] / requests:.2f}/request) over {s['requests']} requests; "
+                f"{s['explored']} exploratory searches found {s['explored_links']}")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,191 @@
+"""
+Adaptive per-host request pacing for the Discord scraper.
+Every host gets its own interval between request starts. It narrows step by
+step while responses are healthy and widens quickly on rate limits, server
+errors and network failures, always within the configured bounds. Explicit
+instructions from the server take precedence: Retry-After pauses the host,
+and rate-limit quota headers (X-RateLimit-* / RateLimit-*) set the pace to
+exactly what the remaining quota allows.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Interval multipliers: widen fast on trouble, narrow slowly while healthy
+WIDEN_FACTOR = 2.0
+NARROW_FACTOR = 0.9
+
+
+def _header(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def _seconds(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _per_second(interval):
+    return 1.0 / interval if interval > 0 else float('inf')
+
+
+def retry_after_seconds(value, now=None):
+    """Seconds to wait from a Retry-After value (delta seconds or an HTTP date), or None."""
+    if value is None:
+        return None
+    delay = _seconds(value)
+    if delay is None:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - (now or time.time())
+        except (TypeError, ValueError):
+            return None
+    return max(delay, 0.0)
+
+
+def quota_window(headers, now=None):
+    """
+    (remaining requests, seconds until the window resets) from rate-limit headers,
+    or None. Reset may be given as seconds to go or as an epoch timestamp.
+    """
+    remaining = _seconds(_header(headers, 'X-RateLimit-Remaining', 'RateLimit-Remaining'))
+    if remaining is None:
+        return None
+    reset_after = _seconds(_header(headers, 'X-RateLimit-Reset-After', 'RateLimit-Reset'))
+    if reset_after is None:
+        reset = _seconds(headers.get('X-RateLimit-Reset'))
+        if reset is not None:
+            # Large values are epoch timestamps, small ones seconds to go
+            reset_after = reset - (now or time.time()) if reset > 1e9 else reset
+    if reset_after is None:
+        return None
+    return remaining, max(reset_after, 0.0)
+
+
+class HostPace:
+    """Pacing state of one host."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_start = 0.0
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.waited = 0.0
+
+
+class RateController:
+    def __init__(self, initial_interval=2.0, min_interval=0.5, max_interval=60.0, max_wait=300.0):
+        """
+        Intervals are seconds between request starts to one host. Each host starts at
+        initial_interval and stays within [min_interval, max_interval]; a server-requested
+        pause (Retry-After, exhausted quota) is capped at max_wait seconds.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.initial_interval = min(max(initial_interval, min_interval), self.max_interval)
+        self.max_wait = max_wait
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _pace(self, host):
+        pace = self._hosts.get(host)
+        if pace is None:
+            pace = self._hosts[host] = HostPace(self.initial_interval)
+        return pace
+
+    def _clamp(self, interval):
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def wait(self, host, sleep=time.sleep):
+        """
+        Block until host may be sent another request, and reserve that slot. sleep
+        does the waiting (AsyncFetchEngine.idle gives up the fetch slot meanwhile).
+        """
+        while True:
+            with self._lock:
+                pace = self._pace(host)
+                now = time.monotonic()
+                start = max(now, pace.next_start, pace.blocked_until)
+                if start <= now:
+                    pace.next_start = now + pace.interval
+                    pace.requests += 1
+                    return
+                pace.waited += start - now
+            # Re-check after sleeping: a rate limit may have paused the host meanwhile
+            sleep(start - now)
+
+    def observe(self, host, status_code=None, headers=None, error=None, retry_after=None):
+        """
+        Adjust host's pace from one outcome: a response (status_code, headers) or a
+        network error. retry_after overrides the Retry-After header, for servers that
+        send it in the body instead.
+        """
+        headers = headers or {}
+        now = time.monotonic()
+        with self._lock:
+            pace = self._pace(host)
+            retry_after = retry_after_seconds(headers.get('Retry-After') if retry_after is None else retry_after)
+            if error is not None or (status_code is not None and status_code >= 500):
+                pace.errors += 1
+                pace.interval = self._clamp(pace.interval * WIDEN_FACTOR)
+                # A 503 may say when to come back, like a 429 does
+                if retry_after is not None:
+                    pace.blocked_until = max(pace.blocked_until, now + min(retry_after, self.max_wait))
+                return
+            quota = quota_window(headers)
+            if status_code == 429:
+                pace.throttled += 1
+                pace.interval = self._clamp(pace.interval * WIDEN_FACTOR)
+                if retry_after is None and quota is not None:
+                    retry_after = quota[1]
+                # Without instructions, hold the host for one (widened) interval
+                pause = pace.interval if retry_after is None else min(retry_after, self.max_wait)
+                pace.blocked_until = max(pace.blocked_until, now + pause)
+                return
+            if retry_after is not None:
+                pace.blocked_until = max(pace.blocked_until, now + min(retry_after, self.max_wait))
+            if quota is not None:
+                remaining, reset_after = quota
+                if remaining < 1:
+                    pace.blocked_until = max(pace.blocked_until, now + min(reset_after, self.max_wait))
+                else:
+                    # Spread the remaining quota over the rest of the window
+                    pace.interval = self._clamp(reset_after / remaining)
+                return
+            pace.interval = self._clamp(pace.interval * NARROW_FACTOR)
+
+    def interval(self, host):
+        """Current seconds between requests to host."""
+        with self._lock:
+            return self._pace(host).interval
+
+    def rate(self, host):
+        """Current requests per second allowed to host."""
+        return _per_second(self.interval(host))
+
+    def host_stats(self):
+        """{host: pacing counters and current rate} for every host seen, busiest first."""
+        with self._lock:
+            hosts = sorted(self._hosts.items(), key=lambda item: -item[1].requests)
+            return {host: {'requests': pace.requests, 'throttled': pace.throttled, 'errors': pace.errors,
+                           'waited_seconds': round(pace.waited, 3), 'rate': round(_per_second(pace.interval), 4)}
+                    for host, pace in hosts}
+
+    def summary(self):
+        with self._lock:
+            hosts = sorted(self._hosts.items(), key=lambda item: -item[1].requests)
+            parts = [f"{host} {_per_second(pace.interval):.2f} req/s ({pace.requests} requests, {pace.throttled} throttled, "
+                     f"{pace.errors} errors, {pace.waited:.0f}s waiting)"
+                     for host, pace in hosts[:3] if pace.requests]
+        if not parts:
+            return "Rate control: no requests made"
+        more = f" and {len(hosts) - 3} more hosts" if len(hosts) > 3 else ""
+        return "Rate control: " + "; ".join(parts) + more
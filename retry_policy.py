@@ -0,0 +1,177 @@
+"""
+Retry policy and per-host circuit breaker for the Discord scraper's fetch path.
+Failed requests are retried with jittered exponential backoff. Idempotent
+requests are retried on network errors and retryable statuses. Requests that
+must not be repeated once the server has them (billed API calls) are retried
+only when the connection failed before anything was sent or the server turned
+them away unprocessed (429). A host that keeps failing opens its circuit:
+requests to it fail at once until a cool-down has passed and a single trial
+request succeeds again.
+"""
+
+import random
+import threading
+import time
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+    def __init__(self, host):
+        super().__init__(f"circuit open for {host}, request not sent")
+        self.host = host
+
+
+def _host_failure(status_code, error):
+    """Outcomes that say the host is unreachable or broken (rate limits do not)."""
+    return error is not None or (status_code is not None and status_code >= 500)
+
+
+def reached_server(error):
+    """False if the request of a failed call certainly never reached the server: no connection could be made."""
+    if isinstance(error, (requests.exceptions.ConnectTimeout, CircuitOpenError)):
+        return False
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return not isinstance(reason, NewConnectionError)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        """
+        A host's circuit opens after failure_threshold failures in a row and stays
+        open for reset_timeout seconds; then one trial request decides whether it closes.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trips = 0
+        self._failures = {}
+        self._opened_at = {}
+        self._probing = set()
+        self._lock = threading.Lock()
+
+    def allow(self, host):
+        """True if a request to host may be sent now."""
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            if host in self._probing or time.monotonic() - opened_at < self.reset_timeout:
+                return False
+            # Half-open: let one trial request through
+            self._probing.add(host)
+            return True
+
+    def record(self, host, failed):
+        with self._lock:
+            self._probing.discard(host)
+            if not failed:
+                self._failures.pop(host, None)
+                self._opened_at.pop(host, None)
+                return
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if host in self._opened_at or failures >= self.failure_threshold:
+                if host not in self._opened_at:
+                    self.trips += 1
+                self._opened_at[host] = time.monotonic()
+
+    def end_probe(self, host):
+        """Free host's trial slot without judging the host (the trial ended in an unrelated error)."""
+        with self._lock:
+            self._probing.discard(host)
+
+    def open_hosts(self):
+        with self._lock:
+            return sorted(self._opened_at)
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0, retry_statuses=RETRY_STATUSES,
+                 breaker=None, seed=None):
+        """
+        max_attempts counts the first try. Backoff before retry n is drawn uniformly
+        from [0, min(max_delay, base_delay * 2**n)] ("full jitter"), so workers that
+        failed together do not retry together. breaker defaults to a CircuitBreaker().
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = set(retry_statuses)
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = {'requests': 0, 'retries': 0, 'recovered': 0, 'failed': 0, 'short_circuited': 0,
+                      'backoff_seconds': 0.0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def backoff(self, retry):
+        with self._lock:
+            return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def retryable(self, status_code=None, error=None, idempotent=True):
+        if error is not None:
+            return idempotent or not reached_server(error)
+        # A 429 means the server turned the request away unprocessed, so even
+        # requests that must not run twice can be sent again
+        return status_code in self.retry_statuses and (idempotent or status_code == 429)
+
+    def call(self, host, send, idempotent=True, sleep=time.sleep):
+        """
+        Call send() until it returns a response that needs no retry, attempts run
+        out, or host's circuit opens. send() returns a requests.Response or raises
+        a requests exception; the last response is returned, the last error re-raised.
+        sleep waits out the backoff between attempts.
+        """
+        self._count('requests')
+        if not self.breaker.allow(host):
+            self._count('short_circuited')
+            raise CircuitOpenError(host)
+        attempt = 0
+        while True:
+            response = error = None
+            try:
+                response = send()
+            except requests.exceptions.RequestException as e:
+                error = e
+            except BaseException:
+                # Not a request failure (e.g. response handling raised): a half-open
+                # circuit must not stay reserved for a trial that will never report back
+                self.breaker.end_probe(host)
+                raise
+            status_code = response.status_code if response is not None else None
+            self.breaker.record(host, _host_failure(status_code, error))
+            # A retry the circuit would refuse ends the call with this outcome
+            retry = (self.retryable(status_code, error, idempotent) and attempt + 1 < self.max_attempts
+                     and self.breaker.allow(host))
+            if not retry:
+                if error is not None or status_code in self.retry_statuses:
+                    self._count('failed')
+                elif attempt:
+                    self._count('recovered')
+                if error is not None:
+                    raise error
+                return response
+            self._count('retries')
+            delay = self.backoff(attempt)
+            with self._lock:
+                self.stats['backoff_seconds'] += delay
+            sleep(delay)
+            attempt += 1
+
+    def summary(self):
+        s = self.stats
+        line = (f"Retries: {s['requests']} requests, {s['retries']} retries, {s['recovered']} recovered, "
+                f"{s['failed']} failed (up to {self.max_attempts} attempts), {s['short_circuited']} refused by "
+                f"open circuits ({self.breaker.trips} trips)")
+        open_hosts = self.breaker.open_hosts()
+        if open_hosts:
+            line += f"; still open: {', '.join(open_hosts[:3])}"
+        return line
@@ -0,0 +1,80 @@
+"""
+Resumable run checkpoints for the Discord scraper.
+A checkpoint is an append-only JSON-lines file: the run's query plan first,
+then one line per finished batch with the links each search found, fsynced
+once the links themselves have been saved. A crashed or stopped run resumes
+from the stored plan with the finished searches skipped, so no search is
+requested twice. The file is removed when the run completes.
+"""
+
+import json
+import os
+import time
+
+from query_planner import PlannedSearch, QueryPlan
+
+
+class RunCheckpoint:
+    def __init__(self, path='run_checkpoint.jsonl'):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def start(self, plan, expected=None, explored=()):
+        """
+        Begin a new checkpoint for plan, replacing any previous one. expected and
+        explored are the scheduler's estimates for the planned queries, kept so a
+        resumed run can still compare expected and actual yield.
+        """
+        header = {
+            'started_at': time.time(),
+            'max_requests': plan.max_requests,
+            'searches': [{'source_type': s.source_type, 'query': s.query, 'google_queries': s.google_queries,
+                          'requests': s.requests, 'via': s.via} for s in plan.searches],
+            'expected': expected or {},
+            'explored': sorted(explored),
+        }
+        tmp_file = self.path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.path)
+
+    def load(self):
+        """
+        Return (plan, done, header) for the checkpointed run, where done maps the index
+        of every finished search to the links it found; None if there is no checkpoint.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().split('\n')
+        except FileNotFoundError:
+            return None
+        # A line torn by a crash mid-append has no newline yet and is dropped
+        lines.pop()
+        if not lines:
+            return None
+        header = json.loads(lines[0])
+        searches = [PlannedSearch(s['source_type'], s['query'], s['google_queries'], s['requests'], s['via'])
+                    for s in header['searches']]
+        done = {}
+        for line in lines[1:]:
+            for index, links in json.loads(line)['done']:
+                done[index] = links
+        return QueryPlan(searches, header['max_requests']), done, header
+
+    def mark_done(self, results):
+        """Durably record a finished batch: (search index, links found) pairs."""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'done': [[index, sorted(links)] for index, links in results]}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def finish(self):
+        """The run completed; nothing is left to resume."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,208 @@
+"""
+Run metrics for the Discord scraper.
+RunMetrics collects counters, per-stage timers and histograms from every layer
+(fetch engine, parse stage, link store, ...). They are thread-safe and cheap
+enough to stay on for every run. At the end of a run the scraper writes them as
+a JSON report; during a run MetricsServer can serve them in the Prometheus text
+format from a local port.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the fetch latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_PREFIX = 'discord_scraper'
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds')
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # counts[i]: observations <= buckets[i]; the last slot holds the rest (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with ('+Inf', count)."""
+        pairs = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None when empty or beyond the last bound)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound if bound != '+Inf' else None
+        return None
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': round(self.sum, 6),
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+                'buckets': {str(bound): total for bound, total in self.cumulative()}}
+
+
+class RunMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self._counters = {}
+        # stage -> [seconds, calls]
+        self._timers = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def add_time(self, stage, seconds, calls=1):
+        with self._lock:
+            timer = self._timers.setdefault(stage, [0.0, 0])
+            timer[0] += seconds
+            timer[1] += calls
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the block as one call of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self):
+        """Counters, stage timers and histograms as plain data."""
+        with self._lock:
+            return {
+                'counters': dict(sorted(self._counters.items())),
+                'stages': {stage: {'seconds': round(seconds, 6), 'calls': calls}
+                           for stage, (seconds, calls) in sorted(self._timers.items())},
+                'histograms': {name: histogram.to_dict() for name, histogram in sorted(self._histograms.items())},
+            }
+
+    def report(self, extra=None):
+        """The run report: when the run ran, the snapshot, and extra sections (component statistics)."""
+        now = time.time()
+        report = {'run': {'started': _iso(self.started), 'finished': _iso(now),
+                          'seconds': round(now - self.started, 3)}}
+        report.update(self.snapshot())
+        report.update(extra or {})
+        return report
+
+    def write_report(self, path, extra=None):
+        """Write report(extra) to path as JSON, replacing the file atomically."""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(extra), f, indent=2, default=str)
+            f.write('\n')
+        os.replace(tmp_path, path)
+
+    def prometheus_text(self, gauges=None):
+        """
+        The metrics in the Prometheus text exposition format. Counters become
+        <prefix>_<name>_total, stage timers <prefix>_stage_seconds_total{stage=...}
+        and <prefix>_stage_calls_total; gauges is an optional {name: value} dict.
+        """
+        snapshot = self.snapshot()
+        p = PROMETHEUS_PREFIX
+        lines = []
+        for name, value in snapshot['counters'].items():
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {value}")
+        if snapshot['stages']:
+            lines.append(f"# TYPE {p}_stage_seconds_total counter")
+            for stage, timer in snapshot['stages'].items():
+                lines.append(f'{p}_stage_seconds_total{{stage="{stage}"}} {timer["seconds"]}')
+            lines.append(f"# TYPE {p}_stage_calls_total counter")
+            for stage, timer in snapshot['stages'].items():
+                lines.append(f'{p}_stage_calls_total{{stage="{stage}"}} {timer["calls"]}')
+        for name, histogram in snapshot['histograms'].items():
+            lines.append(f"# TYPE {p}_{name} histogram")
+            for bound, total in histogram['buckets'].items():
+                lines.append(f'{p}_{name}_bucket{{le="{bound}"}} {total}')
+            lines.append(f"{p}_{name}_sum {histogram['sum']}")
+            lines.append(f"{p}_{name}_count {histogram['count']}")
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {p}_{name} gauge")
+            lines.append(f"{p}_{name} {value}")
+        lines.append(f"# TYPE {p}_uptime_seconds gauge")
+        lines.append(f"{p}_uptime_seconds {round(time.time() - self.started, 3)}")
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    def __init__(self, metrics, port, host='127.0.0.1', gauges=None):
+        """
+        Serve metrics.prometheus_text() at http://host:port/metrics from a background
+        thread. gauges is an optional callable returning extra {name: value} gauges.
+        """
+        self.metrics = metrics
+        self.gauges = gauges
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = server.metrics.prometheus_text(server.gauges() if server.gauges else None).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes every few seconds would drown the run's own output
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.address = self._httpd.server_address
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        return f"http://{self.address[0]}:{self.address[1]}/metrics"
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -3,35 +3,20 @@ Discord Invite Link Scraper for X.com
 This script searches X.com for Discord invite links related to crypto, blockchain, NFT, game, and agent keywords.
 """
 
-import re
 import time
 import json
 from urllib.parse import quote_plus
 import requests
 from bs4 import BeautifulSoup
+from invite_extractor import extract_invite_links
 
 # Keywords to search for
 KEYWORDS = ['crypto', 'blockchain', 'nft', 'game', 'agent']
 BASE_SEARCH_URL = "https://x.com/search"
 
-# Discord invite link patterns
-DISCORD_PATTERNS = [
-    r'discord\.gg/[a-zA-Z0-9]+',
-    r'discord\.com/invite/[a-zA-Z0-9-]+',
-    r'discord\.gg/[a-zA-Z0-9]{7,}',
-]
-
 def extract_discord_links(text):
-    """Extract Discord invite links from text using regex patterns."""
-    links = set()
-    for pattern in DISCORD_PATTERNS:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            if 'discord.gg/' in match:
-                links.add(f"https://{match}")
-            elif 'discord.com/invite/' in match:
-                links.add(f"https://{match}")
-    return links
+    """Extract Discord invite links from text with the shared invite extractor."""
+    return extract_invite_links(text)
 
 def search_x_com(query, max_results=100):
     """
@@ -63,7 +48,8 @@ def main():
     # Read existing links from file
     try:
         with open('invite_link.txt', 'r', encoding='utf-8') as f:
-            existing_links = set(line.strip() for line in f if line.strip())
+            # Normalize every stored form (discord.com/invite/, ...) to discord.gg/ URLs
+            existing_links = extract_invite_links(f.read())
             all_discord_links.update(existing_links)
             print(f"Loaded {len(existing_links)} existing links")
     except FileNotFoundError:
@@ -0,0 +1,222 @@
+"""
+Shared coordinator for running several scraper workers on one query plan.
+The coordinator is one SQLite file that every worker opens, on one host or on
+several hosts sharing a directory with working file locks. The first worker
+publishes the run's query plan; from then on every worker leases small shards
+of searches, runs them and reports the invite codes it found. Codes are merged
+with INSERT OR IGNORE inside the same transaction that marks the shard done, so
+concurrent workers never lose each other's updates, and each search is handed
+out once. Leases expire, so the searches of a crashed worker go back to the pool.
+"""
+
+import json
+import os
+import re
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from invite_extractor import invite_url
+from invite_set import to_code
+from query_planner import PlannedSearch
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def worker_file(path, worker_id):
+    """path with the worker id before the extension (run_report.json -> run_report.w1.json)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{re.sub(r'[^A-Za-z0-9._-]+', '_', worker_id)}{ext}"
+
+
+class ShardCoordinator:
+    def __init__(self, path='coordinator.db', worker_id=None, lease_seconds=600, max_attempts=3):
+        """
+        Open (or create) the coordinator at path. A lease not completed within
+        lease_seconds is handed to another worker; a search leased max_attempts
+        times without completing is marked failed instead of being retried forever.
+        """
+        self.path = path
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.stats = {'leased': 0, 'completed': 0, 'new_links': 0, 'released': 0}
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS searches (
+                idx INTEGER PRIMARY KEY,
+                source_type TEXT NOT NULL,
+                query TEXT NOT NULL,
+                google_queries TEXT NOT NULL,
+                requests INTEGER NOT NULL,
+                via TEXT NOT NULL,
+                expected REAL,
+                explored INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                new_links INTEGER
+            )''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS searches_state ON searches (state, idx)')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS invites (
+                code TEXT PRIMARY KEY,
+                worker TEXT NOT NULL,
+                found_at REAL NOT NULL
+            ) WITHOUT ROWID''')
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the coordinator's write lock: other workers wait until the block ends."""
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    def has_plan(self):
+        return self._conn.execute('SELECT 1 FROM searches LIMIT 1').fetchone() is not None
+
+    def _has_open_searches(self, conn):
+        return conn.execute('SELECT 1 FROM searches WHERE state IN (?, ?) LIMIT 1', (PENDING, LEASED)).fetchone() is not None
+
+    def finished(self):
+        """True when a plan was published and every search in it is done or failed."""
+        return self.has_plan() and not self._has_open_searches(self._conn)
+
+    def publish_plan(self, plan, expected=None, explored=(), seed_codes=()):
+        """
+        Publish the run's plan unless another worker already published one that is
+        still running. A finished plan is replaced, which starts a new run; the merged
+        invites are kept, so the new run only reports invites no run found before.
+        seed_codes are the invites known before the run, so no worker reports them as
+        new. Returns True if this call published the plan.
+        """
+        expected = expected or {}
+        explored = set(explored)
+        with self.exclusive() as conn:
+            if self._has_open_searches(conn):
+                return False
+            conn.execute('DELETE FROM searches')
+            conn.executemany(
+                'INSERT INTO searches (idx, source_type, query, google_queries, requests, via, expected, explored, state) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                ((s.index, s.source_type, s.query, json.dumps(s.google_queries), s.requests, s.via,
+                  expected.get(s.query), s.query in explored, PENDING) for s in plan.searches))
+            now = time.time()
+            conn.executemany('INSERT OR IGNORE INTO invites (code, worker, found_at) VALUES (?, ?, ?)',
+                             ((code, self.worker_id, now) for code in seed_codes))
+        return True
+
+    def plan_estimates(self):
+        """The scheduler's (expected, explored) for the published plan, as publish_plan stored them."""
+        expected = {}
+        explored = set()
+        for query, estimate, was_explored in self._conn.execute('SELECT query, expected, explored FROM searches'):
+            if estimate is not None:
+                expected[query] = estimate
+            if was_explored:
+                explored.add(query)
+        return expected, explored
+
+    def lease(self, count):
+        """
+        Lease up to count searches to this worker: pending ones first, in plan order,
+        then ones whose lease expired. Returns PlannedSearch objects; empty when none are left.
+        """
+        now = time.time()
+        with self.exclusive() as conn:
+            # Searches that keep failing are given up on rather than retried forever
+            conn.execute('UPDATE searches SET state = ? WHERE attempts >= ? '
+                         'AND (state = ? OR (state = ? AND lease_until < ?))',
+                         (FAILED, self.max_attempts, PENDING, LEASED, now))
+            rows = conn.execute(
+                'SELECT idx, source_type, query, google_queries, requests, via FROM searches '
+                'WHERE state = ? OR (state = ? AND lease_until < ?) ORDER BY idx LIMIT ?',
+                (PENDING, LEASED, now, count)).fetchall()
+            conn.executemany('UPDATE searches SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 '
+                             'WHERE idx = ?',
+                             ((LEASED, self.worker_id, now + self.lease_seconds, row[0]) for row in rows))
+        searches = []
+        for idx, source_type, query, google_queries, requests, via in rows:
+            search = PlannedSearch(source_type, query, json.loads(google_queries), requests, via)
+            search.index = idx
+            searches.append(search)
+        self.stats['leased'] += len(searches)
+        return searches
+
+    def complete(self, results):
+        """
+        Merge the links of finished searches, given as (PlannedSearch, links) pairs, and
+        mark the searches done, in one transaction. Returns, per search, the links no
+        worker had reported before.
+        """
+        now = time.time()
+        new_per_search = []
+        with self.exclusive() as conn:
+            for search, links in results:
+                new_links = []
+                for link in sorted(links):
+                    code = to_code(link)
+                    if code is None:
+                        continue
+                    cursor = conn.execute('INSERT OR IGNORE INTO invites (code, worker, found_at) VALUES (?, ?, ?)',
+                                          (code, self.worker_id, now))
+                    if cursor.rowcount:
+                        new_links.append(invite_url(code))
+                conn.execute('UPDATE searches SET state = ?, worker = ?, lease_until = NULL, new_links = ? WHERE idx = ?',
+                             (DONE, self.worker_id, len(new_links), search.index))
+                new_per_search.append(new_links)
+        self.stats['completed'] += len(new_per_search)
+        self.stats['new_links'] += sum(len(links) for links in new_per_search)
+        return new_per_search
+
+    def release(self, searches, failed=False):
+        """
+        Hand leased searches back to the pool at once. Only a failed attempt counts
+        toward max_attempts; a worker that stops early returns its lease untouched.
+        """
+        with self.exclusive() as conn:
+            conn.executemany('UPDATE searches SET state = ?, lease_until = NULL, attempts = attempts - ? '
+                             'WHERE idx = ? AND state = ? AND worker = ?',
+                             ((PENDING, 0 if failed else 1, search.index, LEASED, self.worker_id)
+                              for search in searches))
+        self.stats['released'] += len(searches)
+
+    def codes(self):
+        """Every merged invite code, sorted."""
+        return (code for (code,) in self._conn.execute('SELECT code FROM invites ORDER BY code'))
+
+    def urls(self):
+        return (invite_url(code) for code in self.codes())
+
+    def progress(self):
+        """{state: number of searches} for the whole run."""
+        return dict(self._conn.execute('SELECT state, COUNT(*) FROM searches GROUP BY state').fetchall())
+
+    def summary(self):
+        s = self.stats
+        progress = self.progress()
+        total = sum(progress.values())
+        workers = self._conn.execute('SELECT COUNT(DISTINCT worker) FROM searches WHERE state = ?', (DONE,)).fetchone()[0]
+        invites = self._conn.execute('SELECT COUNT(*) FROM invites').fetchone()[0]
+        return (f"Coordinator: {progress.get(DONE, 0)}/{total} searches done by {workers} workers "
+                f"({progress.get(LEASED, 0)} leased, {progress.get(PENDING, 0)} pending, {progress.get(FAILED, 0)} failed), "
+                f"{invites} invites merged | this worker ({self.worker_id}): {s['completed']} searches, "
+                f"{s['new_links']} new links")
+
+    def close(self):
+        self._conn.close()